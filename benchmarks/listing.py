@@ -0,0 +1,59 @@
+"""Measure the memory used to list the workspaces of a large organization
+
+Parse all the pages of an organization with 20k workspaces, and keep the
+parsed workspaces, as `fetch_workspaces()` consumers like the sharding
+coordinator do. Compare the pydantic models with the compact records.
+
+Run with: `make bench`
+"""
+
+import gc
+import tracemalloc
+from typing import Any
+from typing import Callable
+
+from benchmarks.payloads import PAGE_SIZE
+from benchmarks.payloads import ListWorkspacesResponse
+from benchmarks.payloads import make_page
+from multani.tfcloud.models import WorkspacePage
+
+WORKSPACES = 20_000
+
+
+def measure(name: str, function: Callable[[], Any]) -> None:
+    gc.collect()
+    tracemalloc.start()
+    kept = function()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+
+    print(f"  {name:<30} kept {current / 2**20:6.1f} MiB, peak {peak / 2**20:6.1f} MiB")
+
+
+def main() -> None:
+    total_pages = WORKSPACES // PAGE_SIZE
+    pages = [
+        make_page(PAGE_SIZE, page * PAGE_SIZE, total_pages)
+        for page in range(total_pages)
+    ]
+
+    def models() -> list[Any]:
+        workspaces = []
+        for page in pages:
+            workspaces.extend(ListWorkspacesResponse.model_validate_json(page).data)
+        return workspaces
+
+    def records() -> list[Any]:
+        workspaces = []
+        for page in pages:
+            workspaces.extend(WorkspacePage.parse(page).workspaces)
+        return workspaces
+
+    print(f"List {WORKSPACES} workspaces, {total_pages} pages:")
+    measure("ListWorkspacesResponse", models)
+    measure("WorkspacePage", records)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Measure the cost of parsing the Error Reporting notifications
+
+Compare, for the notifications of the test fixtures, the previous parsing
+(validate as `ErrorReporting`, then parse the JSON again to find out if it
+was a test notification) with `parse_notification()`, which decodes and
+validates the body once, whatever its kind. The errors should be parsed as
+fast as before, within the noise; the test notifications are not parsed a
+second time.
+
+Run with: `make bench`
+"""
+
+import json
+import timeit
+from pathlib import Path
+from typing import Any
+from typing import Callable
+
+from pydantic import ValidationError
+
+from multani.google.models import ErrorReporting
+from multani.google.models import parse_notification
+
+FIXTURES = Path(__file__).parent.parent / "tests" / "fixtures" / "error-reporting"
+
+
+def two_passes(payload: bytes) -> Any:
+    data = payload.replace(rb"\'", b"'")
+    try:
+        return ErrorReporting.model_validate_json(data)
+    except ValidationError:
+        notification = json.loads(payload)
+        if notification.get("version") != "test":
+            raise
+        return notification
+
+
+def measure(name: str, function: Callable[[], Any]) -> float:
+    number = 2000
+    best = min(timeit.repeat(function, number=number, repeat=5)) / number
+    print(f"  {name:<40} {best * 1e6:8.2f} µs")
+    return best
+
+
+def main() -> None:
+    payloads = {path.name: path.read_bytes() for path in sorted(FIXTURES.iterdir())}
+    # The same error, with the broken escape sequences GCP sometimes sends.
+    payloads["error-1.json (broken escapes)"] = payloads["error-1.json"].replace(
+        b"Bad Request", b"Bad \\'Request\\'"
+    )
+
+    for name, payload in payloads.items():
+        print(f"Parse {name} ({len(payload)} bytes):")
+        before = measure(
+            "ErrorReporting, then json.loads()", lambda: two_passes(payload)
+        )
+        after = measure("parse_notification()", lambda: parse_notification(payload))
+        print(f"  {'speedup':<40} {before / after:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
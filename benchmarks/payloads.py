@@ -0,0 +1,184 @@
+"""Measure the CPU cost of the Terraform Cloud payloads, per workspace
+
+Compare the generic pydantic calls with the fast paths of
+`multani.tfcloud.models`, for:
+
+* parsing a page of 100 workspaces, from the bytes of the response, into
+  pydantic models or into compact records;
+* building the body of the request creating a run.
+
+Run with: `make bench`
+"""
+
+import json
+import timeit
+from typing import Any
+from typing import Callable
+
+from pydantic import BaseModel
+from pydantic import Field
+
+from multani.tfcloud.models import RUN_FINAL_STATUSES
+from multani.tfcloud.models import ListMeta
+from multani.tfcloud.models import RunCreateRequest
+from multani.tfcloud.models import WorkspacePage
+from multani.tfcloud.models import run_create_body
+from multani.tfcloud.models import validate_json
+
+PAGE_SIZE = 100
+
+
+# The pydantic models the pages of workspaces were parsed into, before
+# `WorkspacePage`.
+class WorkspaceAttribute(BaseModel):
+    name: str
+    tag_names: list[str] = Field(alias="tag-names")
+    execution_mode: str = Field(alias="execution-mode")
+
+
+class ResourceIdentifier(BaseModel):
+    id: str
+    type: str
+
+
+class CurrentRunRelationship(BaseModel):
+    data: ResourceIdentifier | None = None
+
+
+class WorkspaceListRelationships(BaseModel):
+    current_run: CurrentRunRelationship | None = Field(
+        default=None, alias="current-run"
+    )
+
+
+class Workspace(BaseModel):
+    id: str
+    attributes: WorkspaceAttribute
+    relationships: WorkspaceListRelationships | None = None
+
+    # Resolved from the included resources of the list response.
+    current_run_status: str | None = None
+
+    @property
+    def current_run_id(self) -> str | None:
+        if self.relationships is None or self.relationships.current_run is None:
+            return None
+        if self.relationships.current_run.data is None:
+            return None
+        return self.relationships.current_run.data.id
+
+    @property
+    def has_active_run(self) -> bool:
+        """Is the current run of the workspace still in progress?"""
+
+        status = self.current_run_status
+        return status is not None and status not in RUN_FINAL_STATUSES
+
+
+class IncludedResource(BaseModel):
+    id: str
+    type: str
+    attributes: dict[str, Any] = {}
+
+
+class ListWorkspacesResponse(BaseModel):
+    data: list[Workspace]
+    meta: ListMeta | None = None
+    included: list[IncludedResource] = []
+
+    def model_post_init(self, __context: Any) -> None:
+        statuses = {
+            resource.id: resource.attributes.get("status")
+            for resource in self.included
+            if resource.type == "runs"
+        }
+
+        if statuses:
+            for workspace in self.data:
+                run_id = workspace.current_run_id
+                if run_id is not None:
+                    workspace.current_run_status = statuses.get(run_id)
+
+    @property
+    def total_pages(self) -> int:
+        if self.meta is None or self.meta.pagination is None:
+            return 1
+        return self.meta.pagination.total_pages
+
+
+def make_page(size: int, start: int = 0, total_pages: int = 1) -> bytes:
+    workspaces: list[dict[str, Any]] = [
+        {
+            "id": f"ws-{i:016d}",
+            "type": "workspaces",
+            "attributes": {
+                "name": f"workspace-{i}",
+                "tag-names": ["prod", f"team-{i % 10}"],
+                "execution-mode": "remote",
+            },
+            "relationships": {
+                "current-run": {"data": {"id": f"run-{i:016d}", "type": "runs"}}
+            },
+        }
+        for i in range(start, start + size)
+    ]
+    included = [
+        {"id": f"run-{i:016d}", "type": "runs", "attributes": {"status": "applied"}}
+        for i in range(start, start + size)
+    ]
+    meta = {
+        "pagination": {
+            "current-page": start // size + 1,
+            "total-pages": total_pages,
+            "total-count": size * total_pages,
+        }
+    }
+
+    return json.dumps({"data": workspaces, "included": included, "meta": meta}).encode()
+
+
+def measure(name: str, function: Callable[[], Any], per: int) -> float:
+    number = 200
+    best = min(timeit.repeat(function, number=number, repeat=5)) / number / per
+    print(f"  {name:<40} {best * 1e6:8.2f} µs/workspace")
+    return best
+
+
+def main() -> None:
+    page = make_page(PAGE_SIZE)
+
+    print(f"Parse a page of {PAGE_SIZE} workspaces:")
+    before = measure(
+        "model_validate_json(r.text)",
+        lambda: ListWorkspacesResponse.model_validate_json(page.decode("utf-8")),
+        PAGE_SIZE,
+    )
+    after = measure(
+        "validate_json(r.content)",
+        lambda: validate_json(ListWorkspacesResponse, page),
+        PAGE_SIZE,
+    )
+    print(f"  {'speedup':<40} {before / after:8.2f}x")
+    after = measure(
+        "WorkspacePage.parse(r.content)", lambda: WorkspacePage.parse(page), PAGE_SIZE
+    )
+    print(f"  {'speedup':<40} {before / after:8.2f}x")
+
+    print("Build the body to create a run:")
+    before = measure(
+        "RunCreateRequest.create().model_dump()",
+        lambda: json.dumps(
+            RunCreateRequest.create("ws-1", "Auto-trigger").model_dump()
+        ),
+        1,
+    )
+    after = measure(
+        "run_create_body()",
+        lambda: run_create_body("ws-1", "Auto-trigger"),
+        1,
+    )
+    print(f"  {'speedup':<40} {before / after:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Measure the throughput of `trigger_all` against a local Terraform Cloud
+
+Trigger all the workspaces of organizations of 100, 1k and 10k workspaces,
+served by `FakeTerraformCloud` with a realistic latency, first while the API
+behaves, then while it throttles and fails some of the requests. Report the
+runs created per second, the tail latency of the run creations (from the
+`TriggerReport`) and the peak memory used by the client: the fake doesn't
+record the requests it receives, and the memory it retains (the runs
+created) is not counted.
+
+The rate limit of the client is lifted: the benchmark measures the overhead
+of the client, not the 30 requests/second the real API allows.
+
+Run with: `make bench`
+"""
+
+import asyncio
+import gc
+import logging
+import time
+import tracemalloc
+from typing import Any
+
+import httpx
+import structlog
+
+from multani.http import RetryBudget
+from multani.http import RetryPolicy
+from multani.ratelimit import AdaptiveLimiter
+from multani.tfcloud import TerraformCloud
+from multani.tfcloud.client import TRIGGER_WORKERS
+from multani.tfcloud.report import TriggerReport
+from tests.fake_tfcloud import FakeTerraformCloud
+from tests.fake_tfcloud import lognormal
+from tests.fake_tfcloud import make_workspaces
+
+SIZES = (100, 1_000, 10_000)
+# The median latency of the fake API, in seconds.
+LATENCY = 0.02
+
+SCENARIOS: dict[str, dict[str, Any]] = {
+    "steady": {},
+    "degraded": {"throttle_every": 50, "throttle_burst": 5, "error_rate": 0.02},
+}
+
+
+async def trigger(fake: FakeTerraformCloud) -> TriggerReport:
+    limiter = AdaptiveLimiter(
+        rate=100_000,
+        initial_concurrency=TRIGGER_WORKERS,
+        max_concurrency=TRIGGER_WORKERS,
+    )
+    async with httpx.AsyncClient(transport=fake.transport) as http:
+        tfcloud = TerraformCloud(
+            http,
+            "token",
+            limiter,
+            retry_policy=RetryPolicy(base_delay=0.05),
+            # Only the request errors should limit the retries.
+            retry_budget=RetryBudget(initial=100_000, maximum=100_000),
+        )
+        return await tfcloud.trigger_all(fake.org, [], ["ignore"])
+
+
+def measure(size: int, options: dict[str, Any]) -> None:
+    fake = FakeTerraformCloud(
+        make_workspaces(size),
+        latency=lognormal(LATENCY),
+        record_requests=False,
+        **options,
+    )
+
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    report = asyncio.run(trigger(fake))
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+
+    attributes = report.attributes()
+    del report
+    gc.collect()
+    # What is still allocated is kept by the fake, mostly the runs created.
+    # The fake only grows: this slightly underestimates the peak of the client.
+    retained, _ = tracemalloc.get_traced_memory()
+    peak -= retained
+    tracemalloc.stop()
+
+    triggered = attributes["tfcloud.workspaces.triggered"]
+    assert isinstance(triggered, int)
+    print(
+        f"  {size:>6} workspaces: {triggered / elapsed:7.1f} runs/s, "
+        f"latency p50 {attributes['tfcloud.latency.p50']:.3f}s "
+        f"p95 {attributes['tfcloud.latency.p95']:.3f}s "
+        f"p99 {attributes['tfcloud.latency.p99']:.3f}s, "
+        f"{attributes['tfcloud.retried']} retried, "
+        f"{attributes['tfcloud.workspaces.failed']} failed, "
+        f"peak {peak / 2**20:6.1f} MiB"
+    )
+
+
+def main() -> None:
+    # Each run created and each failure is logged: don't measure the logging,
+    # the failures are counted in the report.
+    structlog.configure(
+        wrapper_class=structlog.make_filtering_bound_logger(logging.CRITICAL)
+    )
+
+    for name, options in SCENARIOS.items():
+        print(f"Trigger all the workspaces, {name} API ({LATENCY * 1000:.0f}ms):")
+        for size in SIZES:
+            measure(size, options)
+
+
+if __name__ == "__main__":
+    main()
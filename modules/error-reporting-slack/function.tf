@@ -20,5 +20,6 @@ module "this" {
     SECRET_HTTP_AUTH_PASSWORD = google_secret_manager_secret_version.http_auth.name
     SECRET_SLACK_API_TOKEN    = "${google_secret_manager_secret.slack.name}/versions/latest"
     SLACK_CHANNEL_ID          = var.slack_channel_id
+    SLACK_COALESCE            = var.slack_coalesce ? "true" : "false"
   }
 }
@@ -27,3 +27,9 @@ variable "slack_channel_id" {
   description = "The Slack channel ID to report errors to"
   type        = string
 }
+
+variable "slack_coalesce" {
+  description = "Update the first Slack message of an error with the number of notifications, instead of posting a new message for each one. The count is updated after the webhook answered, on a best-effort basis."
+  default     = false
+  type        = bool
+}
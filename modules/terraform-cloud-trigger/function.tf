@@ -1,3 +1,10 @@
+locals {
+  # The timeout the function is deployed with: the module doesn't change the
+  # default timeout of Cloud Functions. The function stops creating runs
+  # before this timeout.
+  timeout_seconds = 60
+}
+
 module "this" {
   source  = "multani/function/google"
   version = "1.0.2"
@@ -16,6 +23,15 @@ module "this" {
 
   environment_variables = {
     LOG_FORMAT = "gcp"
+
+    # Where to record which workspaces were triggered for each message.
+    CHECKPOINT_STORE = "gs://${google_storage_bucket.checkpoints.name}/checkpoints/"
+
+    FUNCTION_TIMEOUT_SEC = local.timeout_seconds
+
+    # Where to publish the workspaces left over when the function runs out
+    # of time.
+    TRIGGER_TOPIC = google_pubsub_topic.this.id
   }
 
   event_trigger = {
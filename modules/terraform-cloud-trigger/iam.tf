@@ -14,6 +14,14 @@ resource "google_project_iam_member" "this" {
   project = data.google_project.this.project_id
 }
 
+# https://cloud.google.com/pubsub/docs/access-control#roles
+# Publish follow-up messages, only to the topic of the function
+resource "google_pubsub_topic_iam_member" "publisher" {
+  topic  = google_pubsub_topic.this.id
+  role   = "roles/pubsub.publisher"
+  member = "serviceAccount:${module.this.service_account_email}"
+}
+
 # Allow the service publishing the events in Eventarc (for Pub/Sub events) to
 # call the Cloud Function.
 #
@@ -9,11 +9,17 @@ resource "google_cloud_scheduler_job" "this" {
     topic_name = google_pubsub_topic.this.id
 
     data = base64encode(jsonencode({
-      organization = var.tfe_organization
-      secret_name  = google_secret_manager_secret_version.tfe_token.name
+      organizations = [
+        for organization in concat([var.tfe_organization], var.additional_tfe_organizations) : {
+          organization = organization
+          secret_name  = google_secret_manager_secret_version.tfe_token.name
 
-      tags_included = []
-      tags_excluded = ["ignore"]
+          tags_included = []
+          tags_excluded = ["ignore"]
+
+          shards = var.shards
+        }
+      ]
     }))
   }
 }
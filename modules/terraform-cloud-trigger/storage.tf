@@ -0,0 +1,26 @@
+# Which workspaces were triggered for each Pub/Sub message: the follow-up and
+# shard messages are usually handled by other instances of the function.
+resource "google_storage_bucket" "checkpoints" {
+  name     = "${data.google_project.this.project_id}-${var.name}-checkpoints"
+  location = var.location
+
+  uniform_bucket_level_access = true
+
+  # The messages are only retained for a few minutes, see pubsub.tf
+  lifecycle_rule {
+    condition {
+      age = 1
+    }
+    action {
+      type = "Delete"
+    }
+  }
+}
+
+# https://cloud.google.com/storage/docs/access-control/iam-roles
+# Read and write the checkpoints
+resource "google_storage_bucket_iam_member" "checkpoints" {
+  bucket = google_storage_bucket.checkpoints.name
+  role   = "roles/storage.objectUser"
+  member = "serviceAccount:${module.this.service_account_email}"
+}
@@ -33,3 +33,15 @@ variable "tfe_organization" {
   description = "Which organization to schedule triggers into"
   type        = string
 }
+
+variable "additional_tfe_organizations" {
+  description = "Other organizations to schedule triggers into, with the same token"
+  default     = []
+  type        = list(string)
+}
+
+variable "shards" {
+  description = "In how many shards to split the workspaces, each one triggered by a separate function invocation"
+  default     = 1
+  type        = number
+}
@@ -0,0 +1,169 @@
+"""Remember which workspaces were already processed by a trigger request
+
+Pub/Sub may deliver the same message more than once, and an invocation may be
+interrupted before it processed all the workspaces: the checkpoints record
+which workspaces already got a new run for a given message, so that the next
+invocation for the same message only processes the remaining ones.
+
+The checkpoints are stored either:
+
+* in local files (`file:///path/to/directory`): they are only visible to the
+  same function instance, but they don't require anything else;
+* in an object store, like Google Cloud Storage (`gs://bucket/prefix`).
+"""
+
+import asyncio
+import re
+from pathlib import Path
+from typing import Iterable
+from typing import Protocol
+from typing import Self
+from urllib.parse import urlparse
+
+import structlog
+
+from .google.storage import GCSObjectStore
+
+LOGGER = structlog.get_logger()
+
+# How many new entries trigger a write to the store.
+FLUSH_EVERY = 50
+
+
+class CheckpointStore(Protocol):
+    async def load(self, key: str) -> set[str]:
+        """Load the entries recorded for `key`."""
+        ...
+
+    async def save(self, key: str, entries: set[str], added: list[str]) -> None:
+        """Record the `added` entries for `key`; `entries` contains all of them."""
+        ...
+
+
+class ObjectStore(Protocol):
+    async def get(self, name: str) -> bytes | None: ...
+
+    async def put(self, name: str, data: bytes) -> None: ...
+
+
+class LocalFileCheckpointStore:
+    """Store the checkpoints in local files, one line per entry."""
+
+    def __init__(self, directory: Path) -> None:
+        self.directory = directory
+
+    def _path(self, key: str) -> Path:
+        return self.directory / re.sub(r"[^\w.-]", "_", key)
+
+    async def load(self, key: str) -> set[str]:
+        path = self._path(key)
+        if not path.exists():
+            return set()
+
+        return set(path.read_text().split())
+
+    async def save(self, key: str, entries: set[str], added: list[str]) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        with self._path(key).open("a") as fp:
+            fp.writelines(f"{entry}\n" for entry in added)
+
+
+class ObjectStoreCheckpointStore:
+    """Store the checkpoints as objects, one object per key."""
+
+    def __init__(self, store: ObjectStore, prefix: str = "") -> None:
+        self.store = store
+        self.prefix = prefix
+
+    def _name(self, key: str) -> str:
+        return f"{self.prefix}{key}"
+
+    async def load(self, key: str) -> set[str]:
+        data = await self.store.get(self._name(key))
+        if data is None:
+            return set()
+
+        return set(data.decode("utf-8").split())
+
+    async def save(self, key: str, entries: set[str], added: list[str]) -> None:
+        # Objects can't be appended to: write all the entries again.
+        data = "".join(f"{entry}\n" for entry in sorted(entries))
+        await self.store.put(self._name(key), data.encode("utf-8"))
+
+
+def build_store(uri: str) -> CheckpointStore | None:
+    """Build a checkpoint store from its URI, None if checkpoints are disabled.
+
+    >>> build_store("file:///tmp/checkpoints").directory
+    PosixPath('/tmp/checkpoints')
+    >>> build_store("") is None
+    True
+    """
+
+    u = urlparse(uri)
+
+    if u.scheme == "file":
+        return LocalFileCheckpointStore(Path(u.path))
+    elif u.scheme == "gs":
+        prefix = u.path.lstrip("/")
+        if prefix and not prefix.endswith("/"):
+            prefix += "/"
+        return ObjectStoreCheckpointStore(GCSObjectStore(u.netloc), prefix)
+    elif u.scheme == "":
+        return None
+
+    raise ValueError(f"Unsupported checkpoint store: {uri!r}")
+
+
+class Checkpoint:
+    """The entries (workspace IDs) already processed for a given key.
+
+    New entries are buffered, and written to the store every `flush_every`
+    entries, and when `flush()` is called.
+    """
+
+    def __init__(
+        self,
+        store: CheckpointStore,
+        key: str,
+        entries: Iterable[str] = (),
+        flush_every: int = FLUSH_EVERY,
+    ) -> None:
+        self.store = store
+        self.key = key
+        self.entries = set(entries)
+        self.flush_every = flush_every
+
+        self._added: list[str] = []
+        self._lock = asyncio.Lock()
+        self.logger = LOGGER.bind(checkpoint=key)
+
+    @classmethod
+    async def load(cls, store: CheckpointStore, key: str) -> Self:
+        entries = await store.load(key)
+        if entries:
+            LOGGER.info(f"Resuming from {len(entries)} checkpointed entries", key=key)
+        return cls(store, key, entries)
+
+    def __contains__(self, entry: str) -> bool:
+        return entry in self.entries
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    async def add(self, entry: str) -> None:
+        self.entries.add(entry)
+        self._added.append(entry)
+
+        if len(self._added) >= self.flush_every:
+            await self.flush()
+
+    async def flush(self) -> None:
+        async with self._lock:
+            added, self._added = self._added, []
+            if not added:
+                return
+
+            self.logger.debug(f"Saving {len(added)} new checkpoint entries")
+            await self.store.save(self.key, set(self.entries), added)
@@ -3,11 +3,21 @@ import json
 from os.path import expanduser
 
 import click
-import httpx
+import structlog
 from opentelemetry.sdk.trace.export import SpanExporter
 
 from . import tracing
+from .http import close_shared_client
+from .http import shared_client
 from .tfcloud import TerraformCloud
+from .tfcloud.client import ListingStats
+from .tfcloud.models import WorkspaceRef
+from .tfcloud.report import TriggerReport
+from .tfcloud.runs import TIMEOUT
+from .tfcloud.runs import RunSummary
+from .tfcloud.runs import RunTracker
+
+LOGGER = structlog.get_logger()
 
 
 def validate_tracing(
@@ -31,19 +41,34 @@ def cli(trace_exporter: SpanExporter) -> None:
 
 
 @cli.command()
-@click.argument("org_name")
+@click.argument("org_names", nargs=-1, required=True)
 @click.option("--token", help="The Terraform Cloud authentication token")
 @click.option("--include", help="Tags to include", multiple=True)
 @click.option("--exclude", help="Tags to exclude", multiple=True)
+@click.option("--selector", help="Expression to select the workspaces")
+@click.option(
+    "--dry-run", is_flag=True, help="Only list the workspaces to trigger, with timings"
+)
+@click.option("--wait", is_flag=True, help="Wait for the runs to complete")
+@click.option(
+    "--wait-timeout",
+    help="How long to wait for the runs, in seconds",
+    default=TIMEOUT,
+    show_default=True,
+)
 def terraform_cloud_trigger_all(
-    org_name: str,
+    org_names: list[str],
     include: list[str],
     exclude: list[str],
+    selector: str | None,
     token: str,
+    dry_run: bool,
+    wait: bool,
+    wait_timeout: float,
 ) -> None:
-    """Start new runs in the workspaces of a Terraform Cloud organization.
+    """Start new runs in the workspaces of Terraform Cloud organizations.
 
-    ORG_NAME is the name (not the ID) of the Terraform Cloud organization.
+    ORG_NAMES are the names (not the IDs) of the Terraform Cloud organizations.
     """
 
     if token is None:
@@ -52,11 +77,78 @@ def terraform_cloud_trigger_all(
 
         token = data["credentials"]["app.terraform.io"]["token"]
 
-    http = httpx.AsyncClient()
-    tfcloud = TerraformCloud(http, token)
-    task = tfcloud.trigger_all(org_name, include, exclude)
+    tracer = tracing.get_tracer(__name__)
+
+    async def trigger(tfcloud: TerraformCloud, org_name: str) -> TriggerReport:
+        tracker = None
+        if wait:
+            tracker = RunTracker(tfcloud, org_name, timeout=wait_timeout)
+
+        with tracer.start_as_current_span("cli: trigger all") as span:
+            report = await tfcloud.trigger_all(
+                org_name, include, exclude, selector, tracker=tracker
+            )
+            report.emit(LOGGER, span)
+            return report
+
+    async def list_all() -> None:
+        tfcloud = TerraformCloud(shared_client(), token)
+        try:
+            for org_name in org_names:
+                workspaces, stats = await tfcloud.dry_run(
+                    org_name, include, exclude, selector
+                )
+                print_dry_run(org_name, workspaces, stats)
+        finally:
+            await close_shared_client()
+
+    if dry_run:
+        asyncio.run(list_all())
+        return
+
+    async def trigger_all() -> list[TriggerReport]:
+        tfcloud = TerraformCloud(shared_client(), token)
+        try:
+            return await asyncio.gather(
+                *[trigger(tfcloud, org_name) for org_name in org_names]
+            )
+        finally:
+            await close_shared_client()
+
+    reports = asyncio.run(trigger_all())
+    for report in reports:
+        if report.runs is not None:
+            print_summary(report.runs)
+
+
+def print_dry_run(
+    org_name: str, workspaces: list[WorkspaceRef], stats: ListingStats
+) -> None:
+    for ws in workspaces:
+        click.echo(f"{ws.id:<24} {ws.name}")
+    for ws in stats.skipped_active:
+        click.echo(f"{ws.id:<24} {ws.name} (skipped: run in progress)")
+
+    click.echo(
+        f"{org_name}: {len(workspaces)} workspaces to trigger, "
+        f"{stats.selected} selected out of {stats.listed} listed in {stats.pages} pages"
+    )
+    timings = ", ".join(
+        f"{name} {value:.3f}s" for name, value in stats.timings().items()
+    )
+    click.echo(f"{org_name}: {timings}")
+
+
+def print_summary(summary: RunSummary) -> None:
+    for outcome in summary.outcomes:
+        status = outcome.status if outcome.done else "pending"
+        duration = f"{outcome.duration:.0f}s" if outcome.duration is not None else "-"
+        click.echo(f"{status:<24} {duration:>8}  {outcome.workspace.name}")
 
-    asyncio.run(task)
+    counts = ", ".join(
+        f"{total} {status}" for status, total in summary.counts().items()
+    )
+    click.echo(f"{len(summary.outcomes)} runs: {counts}")
 
 
 def main() -> None:
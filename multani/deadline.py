@@ -0,0 +1,41 @@
+import os
+import time
+from typing import Self
+
+# The default timeout of event-driven Cloud Functions.
+DEFAULT_FUNCTION_TIMEOUT = 60
+
+
+class Deadline:
+    """A point in time (on the monotonic clock) to finish some work by."""
+
+    def __init__(self, at: float) -> None:
+        self.at = at
+
+    @classmethod
+    def after(cls, seconds: float) -> Self:
+        return cls(time.monotonic() + seconds)
+
+    @classmethod
+    def from_function_timeout(cls, margin: float = 0) -> Self:
+        """The deadline of the current Cloud Function invocation, minus `margin`.
+
+        The timeout is read from `FUNCTION_TIMEOUT_SEC`, which the Terraform
+        module sets to the timeout the function is deployed with: Cloud
+        Functions doesn't expose it to the function.
+        """
+
+        timeout = float(
+            os.environ.get("FUNCTION_TIMEOUT_SEC", DEFAULT_FUNCTION_TIMEOUT)
+        )
+        return cls.after(timeout - margin)
+
+    def remaining(self) -> float:
+        """How many seconds are left before the deadline (negative if passed)."""
+
+        return self.at - time.monotonic()
+
+    def expired(self, margin: float = 0) -> bool:
+        """Is the deadline passed, or less than `margin` seconds away?"""
+
+        return self.remaining() < margin
@@ -1,8 +1,7 @@
 import asyncio
 import os
-from typing import Any
+from pathlib import Path
 
-import httpx
 import structlog
 from cloudevents.http.event import CloudEvent
 from flask import Request
@@ -11,37 +10,295 @@ from flask.typing import ResponseReturnValue
 
 from multani import secrets
 from multani import tracing
-from multani.google.models import ErrorReporting
-from multani.google.models import is_test_notification
+from multani.checkpoint import Checkpoint
+from multani.checkpoint import build_store
+from multani.deadline import Deadline
+from multani.google import pubsub
+from multani.google.models import TestNotification
+from multani.google.models import notification_from_request
+from multani.http import RetryBudget
 from multani.http import check_authorization
-from multani.slack import SlackClient
+from multani.http import close_shared_client
+from multani.http import shared_client
+from multani.slack import AsyncSlackClient
+from multani.slack import ChannelScheduler
+from multani.slack import SlackMessage
+from multani.slack_coalescing import ErrorCoalescer
+from multani.slack_rendering import render_error
+from multani.tfcloud import DeadlineExceeded
 from multani.tfcloud import TerraformCloud
+from multani.tfcloud import default_limiter
+from multani.tfcloud.inventory import InventoryCache
+from multani.tfcloud.report import cap
+from multani.tfcloud.runs import RunTracker
 
 from . import functions_framework
 from .models import TerraformCloudTriggerAllRequest
 
 LOGGER = structlog.get_logger()
 
+# Where to record which workspaces were triggered for each Pub/Sub message.
+# The follow-up and shard messages are usually handled by other instances: in
+# production, this must be shared by all the instances (`gs://bucket/prefix`).
+# Checkpoints are disabled if it's not set.
+CHECKPOINT_STORE = ""
+# Where to keep the listing of the workspaces between invocations, if not
+# only in memory.
+INVENTORY_CACHE = "/tmp/multani/inventory"
 
-@functions_framework.cloud_event
-def terraform_cloud_trigger_all(event: CloudEvent) -> None:
+# The listing of the workspaces, kept while the function instance is warm.
+_inventory_dir = os.environ.get("INVENTORY_CACHE", INVENTORY_CACHE)
+_INVENTORY = InventoryCache(Path(_inventory_dir) if _inventory_dir else None)
+
+
+@functions_framework.async_cloud_event
+async def terraform_cloud_trigger_all(event: CloudEvent) -> None:
     tracer = tracing.get_tracer(__name__)
     logger = LOGGER.bind(function="trigger_all_handler")
 
+    # Stop creating runs before the function times out.
+    deadline = Deadline.from_function_timeout()
+
     logger.info("Fetching parameters from event")
 
     request = TerraformCloudTriggerAllRequest.from_cloud_event(event)
-    token = secrets.fetch_secret(request.secret_name)
+    targets = request.targets()
+
+    # Fetch each secret once, even if several organizations share it.
+    secret_names = sorted({target.secret_name for target in targets})
+    fetched = await asyncio.gather(
+        *[asyncio.to_thread(secrets.fetch_secret, name) for name in secret_names]
+    )
+    tokens = dict(zip(secret_names, fetched))
+
+    # All the organizations share the same connections and the same limits.
+    limiter = default_limiter()
+    retry_budget = RetryBudget()
+
+    with tracer.start_as_current_span("func: trigger all") as span:
+        span.set_attribute("tfcloud.organizations", len(targets))
+
+        results = await asyncio.gather(
+            *[
+                trigger_organization(
+                    TerraformCloud(
+                        shared_client(),
+                        tokens[target.secret_name],
+                        limiter,
+                        retry_budget=retry_budget,
+                        inventory=_INVENTORY,
+                    ),
+                    target,
+                    deadline,
+                )
+                for target in targets
+            ],
+            return_exceptions=True,
+        )
+
+    # Don't let one organization prevent the others from being triggered.
+    errors = []
+    for target, result in zip(targets, results):
+        if isinstance(result, BaseException):
+            logger.error(
+                f"Unable to trigger organization {target.organization!r}",
+                exc_info=result,
+            )
+            errors.append(result)
+
+    if len(errors) == 1:
+        raise errors[0]
+    elif errors:
+        raise BaseExceptionGroup(f"{len(errors)} organizations failed", errors)
+
+
+async def trigger_organization(
+    tfcloud: TerraformCloud,
+    request: TerraformCloudTriggerAllRequest,
+    deadline: Deadline,
+) -> None:
+    """Trigger the workspaces of a single organization request."""
 
-    with tracer.start_as_current_span("func: trigger all"):
-        http = httpx.AsyncClient()
-        tfcloud = TerraformCloud(http, token)
-        task = tfcloud.trigger_all(
+    tracer = tracing.get_tracer(__name__)
+    logger = LOGGER.bind(function="trigger_all_handler")
+
+    if request.dry_run:
+        workspaces, stats = await tfcloud.dry_run(
             request.organization,
             request.tags_included,
             request.tags_excluded,
+            request.selector,
+            request.priorities,
+            workspaces=request.workspaces,
+        )
+        names, omitted = cap([ws.name for ws in workspaces])
+        skipped_active, omitted_skipped = cap([ws.name for ws in stats.skipped_active])
+        logger.info(
+            f"Dry run: {len(workspaces)} workspaces would be triggered",
+            organization=request.organization,
+            workspaces=names,
+            skipped_active=skipped_active,
+            omitted={"workspaces": omitted, "skipped_active": omitted_skipped},
+            listed=stats.listed,
+            selected=stats.selected,
+            pages=stats.pages,
+            **stats.timings(),
+        )
+        return
+
+    if request.shards > 1 and request.workspaces is None:
+        # Coordinator: list the workspaces once, and let other invocations
+        # trigger them, one shard each.
+        with tracer.start_as_current_span("func: shard trigger all"):
+            await shard_request(tfcloud, request)
+        return
+
+    # Pub/Sub may deliver the same message several times: only trigger the
+    # workspaces which were not triggered yet for this message.
+    checkpoint = None
+    store = build_store(os.environ.get("CHECKPOINT_STORE", CHECKPOINT_STORE))
+    if store is None:
+        logger.warning("CHECKPOINT_STORE is not set, checkpoints are disabled")
+    elif request.checkpoint is not None:
+        checkpoint = await Checkpoint.load(store, request.checkpoint)
+
+    tracker = RunTracker(tfcloud, request.organization) if request.wait else None
+
+    with tracer.start_as_current_span("func: trigger organization") as span:
+        span.set_attribute("tfcloud.organization", request.organization)
+        try:
+            report = await tfcloud.trigger_all(
+                request.organization,
+                request.tags_included,
+                request.tags_excluded,
+                request.selector,
+                checkpoint=checkpoint,
+                deadline=deadline,
+                priorities=request.priorities,
+                workspaces=request.workspaces,
+                tracker=tracker,
+            )
+        except DeadlineExceeded as exc:
+            report = exc.report
+            follow_up = request.follow_up(exc.remaining, exc.listed_all)
+            await publish_request(follow_up)
+
+        report.emit(logger, span)
+
+
+async def shard_request(
+    tfcloud: TerraformCloud, request: TerraformCloudTriggerAllRequest
+) -> None:
+    """List the workspaces of a request and publish one request per shard."""
+
+    logger = LOGGER.bind(function="trigger_all_handler")
+
+    refs = tfcloud.iter_workspace_refs(
+        request.organization,
+        request.tags_included,
+        request.tags_excluded,
+        request.selector,
+        request.priorities,
+    )
+    workspaces = [ref async for ref in refs]
+
+    shards = request.shard_requests(workspaces)
+    logger.info(
+        f"Publishing {len(shards)} shards for {len(workspaces)} workspaces",
+        shards=request.shards,
+    )
+    await asyncio.gather(*[publish_request(shard) for shard in shards])
+
+
+async def publish_request(request: TerraformCloudTriggerAllRequest) -> None:
+    """Publish a trigger-all request, to be processed by another invocation."""
+
+    logger = LOGGER.bind(function="trigger_all_handler")
+
+    topic = os.environ.get("TRIGGER_TOPIC")
+    if topic is None:
+        logger.error(
+            "TRIGGER_TOPIC is not set, unable to publish the request",
+            request=request.model_dump(),
         )
-        asyncio.run(task)
+        return
+
+    data = request.model_dump_json(exclude_defaults=True).encode("utf-8")
+    message_id = await pubsub.publish(topic, data)
+    logger.info("Request published", message_id=message_id)
+
+
+# The HTTP client is kept alive between invocations.
+functions_framework.on_shutdown(close_shared_client)
+
+
+# The messages to each channel are spaced, for all the invocations.
+_SLACK_SCHEDULER = ChannelScheduler()
+
+
+async def slack_client() -> AsyncSlackClient:
+    token = await asyncio.to_thread(
+        secrets.fetch_secret_from_env, "SECRET_SLACK_API_TOKEN"
+    )
+    return AsyncSlackClient(token, _SLACK_SCHEDULER)
+
+
+async def _post_to_slack(message: SlackMessage) -> str:
+    client = await slack_client()
+    ts = await client.post_message(
+        message.channel_id,
+        blocks=message.blocks,
+        text=message.text,
+        icon_emoji=message.icon_emoji,
+    )
+
+    attachment = message.attachment
+    if attachment is not None:
+        # The message is posted already: don't fail it if the upload fails.
+        try:
+            await client.upload_file(
+                message.channel_id,
+                attachment.filename,
+                attachment.content.encode("utf-8"),
+                title=attachment.title,
+                thread_ts=ts,
+            )
+        except Exception as exc:
+            LOGGER.exception("Unable to upload attachment to Slack", exception=exc)
+
+    return ts
+
+
+async def _update_on_slack(message: SlackMessage, ts: str) -> None:
+    client = await slack_client()
+    await client.update_message(
+        message.channel_id, ts, blocks=message.blocks, text=message.text
+    )
+
+
+# The repeated notifications of the same error update the first message, with
+# `SLACK_COALESCE=true`.
+_COALESCER = ErrorCoalescer(_post_to_slack, _update_on_slack)
+functions_framework.on_shutdown(_COALESCER.flush)
+
+
+def deliver(message: SlackMessage) -> ResponseReturnValue:
+    """Post `message` to Slack, before answering the webhook.
+
+    Cloud Functions throttles the CPU of an instance once it answered, and
+    may stop the instance: nothing can be left to post in the background. If
+    the message can't be posted, the error is raised, so that Cloud
+    Monitoring sends the notification again. The notifications of
+    the same error are coalesced if `SLACK_COALESCE` is `true`, see
+    `multani.slack_coalescing`.
+    """
+
+    if os.environ.get("SLACK_COALESCE", "false") == "true":
+        functions_framework.BACKGROUND_LOOP.run(_COALESCER.notify(message))
+    else:
+        functions_framework.BACKGROUND_LOOP.run(_post_to_slack(message))
+
+    return Response("Sent to Slack", 200)
 
 
 # https://api.slack.com/apps/A069JJT5QMS/
@@ -62,68 +319,23 @@ def error_reporting_slack(request: Request) -> ResponseReturnValue:
 
     logger.debug("HTTP request", headers=request.headers, data=request.data)
 
-    token = secrets.fetch_secret_from_env("SECRET_SLACK_API_TOKEN")
-    client = SlackClient(token)
-
     with tracer.start_as_current_span("Error Reporting: parse"):
-        try:
-            error = ErrorReporting.from_request(request)
-        except:  # Try to parse it as a test notification? # noqa: E722
-            if not is_test_notification(request):
-                raise
-
-            # The webhook is being tested ...
-            # The payload used during the test notification is an Incident
-            # object, not an Error Reporting object...
-            logger.info("Received a test notification")
-            text = "Testing the notification channel :wave:"
-            client.post_message(channel_id, text=text, icon_emoji="📞")
-            return ("OK", 200)
-
-    blocks: list[dict[Any, Any]] = [
-        {
-            "type": "header",
-            "text": {
-                "type": "plain_text",
-                "text": f"🚨 {error.subject}",
-                "emoji": True,
-            },
-        },
-        {
-            "type": "section",
-            "fields": [
-                {
-                    "type": "mrkdwn",
-                    "text": f"*Type:*\n`{error.exception_info.type}`",
-                },
-                {
-                    "type": "mrkdwn",
-                    "text": f"*Message:*\n{error.exception_info.message}",
-                },
-                {
-                    "type": "mrkdwn",
-                    "text": f"<{error.group_info.detail_link}|ℹ️  View error>",
-                },
-            ],
-        },
-        {
-            "type": "rich_text",
-            "elements": [
-                {
-                    "type": "rich_text_preformatted",
-                    "elements": [
-                        {
-                            "type": "text",
-                            "text": error.event_info.log_message,
-                        },
-                    ],
-                },
-            ],
-        },
-    ]
+        error = notification_from_request(request)
 
-    logger.info("Posting error to Slack")
-    client.post_message(channel_id, blocks=blocks, icon_emoji="🚨")
-    logger.info("Error posted to Slack")
+    if isinstance(error, TestNotification):
+        # The webhook is being tested ...
+        logger.info("Received a test notification")
+        text = "Testing the notification channel :wave:"
+        return deliver(SlackMessage(channel_id, text=text, icon_emoji="📞"))
+
+    rendered = render_error(error)
 
-    return Response("Error sent to Slack", 200)
+    logger.info("Posting error to Slack")
+    message = SlackMessage(
+        channel_id,
+        blocks=rendered.blocks,
+        icon_emoji="🚨",
+        group=error.group_info.detail_link,
+        attachment=rendered.attachment,
+    )
+    return deliver(message)
@@ -8,7 +8,13 @@ See:
 * https://github.com/GoogleCloudPlatform/functions-framework-python
 """
 
+import asyncio
+import atexit
 import functools
+import threading
+from typing import Awaitable
+from typing import Callable
+from typing import TypeVar
 
 import functions_framework
 import structlog
@@ -17,6 +23,116 @@ from flask import Request
 from flask.typing import ResponseReturnValue
 from functions_framework import CloudEventFunction
 from functions_framework import HTTPFunction
+from opentelemetry import context
+
+from .logging import loop_error_handler_installer
+
+T = TypeVar("T")
+
+AsyncCloudEventFunction = Callable[[CloudEvent], Awaitable[None]]
+AsyncHTTPFunction = Callable[[Request], Awaitable[ResponseReturnValue]]
+ShutdownHook = Callable[[], Awaitable[None]]
+
+
+class BackgroundLoop:
+    """An asyncio event loop running forever in a dedicated thread.
+
+    Running all the coroutines of a Cloud Function instance in the same loop
+    allows to keep loop-bound resources (like HTTP connection pools) alive
+    between invocations, instead of creating and tearing down a new loop with
+    `asyncio.run()` on each invocation.
+    """
+
+    def __init__(self) -> None:
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self._shutdown_hooks: list[ShutdownHook] = []
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """The background loop, started on first use."""
+
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(
+                    target=loop.run_forever, name="asyncio-loop", daemon=True
+                )
+                thread.start()
+
+                async def install_error_handler() -> None:
+                    loop_error_handler_installer()
+
+                asyncio.run_coroutine_threadsafe(install_error_handler(), loop).result()
+
+                self._loop = loop
+                self._thread = thread
+                atexit.register(self.stop)
+
+            return self._loop
+
+    def run(self, coro: Awaitable[T]) -> T:
+        """Run a coroutine in the background loop, and wait for its result.
+
+        The current OpenTelemetry context is propagated to the coroutine, so
+        that its spans are attached to the caller's trace.
+        """
+
+        future = asyncio.run_coroutine_threadsafe(
+            _with_context(coro, context.get_current()), self.loop
+        )
+        return future.result()
+
+    def on_shutdown(self, hook: ShutdownHook) -> None:
+        """Run `hook` in the loop, before the loop stops."""
+
+        self._shutdown_hooks.append(hook)
+
+    def stop(self) -> None:
+        """Run the shutdown hooks, then stop the loop and its thread."""
+
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+
+        if loop is None or thread is None:
+            return
+
+        logger = structlog.get_logger()
+
+        async def shutdown() -> None:
+            for hook in reversed(self._shutdown_hooks):
+                try:
+                    await hook()
+                except Exception as exc:
+                    logger.exception(f"Error calling {hook}", exception=exc)
+
+        asyncio.run_coroutine_threadsafe(shutdown(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+
+async def _with_context(coro: Awaitable[T], ctx: context.Context) -> T:
+    token = context.attach(ctx)
+    try:
+        return await coro
+    finally:
+        context.detach(token)
+
+
+BACKGROUND_LOOP = BackgroundLoop()
+
+
+def on_shutdown(hook: ShutdownHook) -> ShutdownHook:
+    """Register a coroutine function to call when the background loop stops.
+
+    Use this to release the resources bound to the loop, like HTTP clients.
+    """
+
+    BACKGROUND_LOOP.on_shutdown(hook)
+    return hook
 
 
 def cloud_event(func: CloudEventFunction) -> CloudEventFunction:
@@ -59,3 +175,31 @@ def http(func: HTTPFunction) -> HTTPFunction:
         return result
 
     return functions_framework.http(logging_handler)
+
+
+def async_cloud_event(func: AsyncCloudEventFunction) -> CloudEventFunction:
+    """Like `cloud_event`, for a coroutine function.
+
+    The coroutine runs in the long-lived background loop.
+    """
+
+    @functools.wraps(func)
+    def loop_handler(event: CloudEvent) -> None:
+        BACKGROUND_LOOP.run(func(event))
+
+    return cloud_event(loop_handler)
+
+
+def async_http(func: AsyncHTTPFunction) -> HTTPFunction:
+    """Like `http`, for a coroutine function.
+
+    The coroutine runs in the long-lived background loop, which is not the
+    thread of the Flask request: use the `request` parameter instead of
+    `flask.request`.
+    """
+
+    @functools.wraps(func)
+    def loop_handler(request: Request) -> ResponseReturnValue:
+        return BACKGROUND_LOOP.run(func(request))
+
+    return http(loop_handler)
@@ -0,0 +1,33 @@
+import asyncio
+
+import structlog
+from google.auth import default
+from google.auth.transport.requests import Request
+
+LOGGER = structlog.get_logger()
+SCOPES = ["https://www.googleapis.com/auth/cloud-platform"]
+
+_CREDENTIALS = None
+
+
+async def access_token() -> str:
+    """Get an OAuth2 access token from the default Google credentials.
+
+    The credentials are loaded once, and refreshed when they expire.
+    """
+
+    global _CREDENTIALS
+
+    if _CREDENTIALS is None:
+        _CREDENTIALS, _ = await asyncio.to_thread(default, scopes=SCOPES)
+
+    if not _CREDENTIALS.valid:
+        LOGGER.debug("Refreshing Google credentials")
+        await asyncio.to_thread(_CREDENTIALS.refresh, Request())
+
+    token: str = _CREDENTIALS.token
+    return token
+
+
+async def auth_headers() -> dict[str, str]:
+    return {"Authorization": f"Bearer {await access_token()}"}
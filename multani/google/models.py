@@ -1,8 +1,21 @@
-from typing import Self
+"""The notifications sent by Google Cloud Monitoring to the webhooks
+
+The notifications of Error Reporting are `ErrorReporting` objects, except
+when the notification channel is tested: the webhook then receives a
+`TestNotification`, which contains an `Incident`. `parse_notification()`
+decodes and validates both kinds straight from the JSON: the notifications
+whose `version` is "test" are test notifications, any other is an error.
+"""
+
+from typing import Annotated
+from typing import Any
+from typing import Literal
 
 import flask
 import structlog
 from pydantic import BaseModel
+from pydantic import Field
+from pydantic import TypeAdapter
 
 LOGGER = structlog.get_logger()
 
@@ -35,32 +48,78 @@ class ErrorReporting(BaseModel):
     exception_info: ErrorReportingExceptionInfo
     event_info: ErrorReportingEventInfo
 
-    @classmethod
-    def from_request(cls, request: flask.Request) -> Self:
-        content_type = request.headers.get("content-type")
-        if content_type != "application/json":
-            raise ValueError(f"Invalid request content type: {content_type}")
 
-        data = request.data
-        # Google doesn't always serialize the payload to JSON correctly...
-        data = data.replace(rb"\'", b"'")
+class Incident(BaseModel):
+    incident_id: str
+    summary: str = ""
+    state: str = ""
+    policy_name: str = ""
+    condition_name: str = ""
+    url: str = ""
+
+
+class TestNotification(BaseModel):
+    """The notification sent when the notification channel is tested."""
+
+    version: Literal["test"]
+    incident: Incident
+
+
+# The test notifications are tried first: their `version` is checked
+# straight from the JSON, and any other notification is an error.
+Notification = Annotated[
+    TestNotification | ErrorReporting, Field(union_mode="left_to_right")
+]
+_NOTIFICATION: TypeAdapter[Any] = TypeAdapter(Notification)
+
 
-        LOGGER.debug("Received an error", error=data)
-        return cls.model_validate_json(data)
+def fix_escapes(data: bytes) -> bytes:
+    r"""Fix the `\'` escape sequences Google sometimes sends in its JSON.
 
+    The payload is only copied if it contains such a sequence.
 
-def is_test_notification(request: flask.Request) -> bool:
-    """Is the notification received in the request a "test" notification?
+    >>> print(fix_escapes(rb"KeyError: \'data\'").decode())
+    KeyError: 'data'
+    >>> print(fix_escapes(rb"it\\'s, it\\\'s").decode())
+    it\\'s, it\\'s
+    """
+
+    if rb"\'" not in data:
+        return data
+
+    parts = data.split(rb"\'")
+    fixed = [parts[0]]
+    for part in parts[1:]:
+        # The backslash is escaped itself if an odd number of backslashes
+        # precede it.
+        previous = fixed[-1]
+        escaped = (len(previous) - len(previous.rstrip(b"\\"))) % 2
+        fixed.append(rb"\'" if escaped else b"'")
+        fixed.append(part)
+
+    return b"".join(fixed)
 
-    A "test" notification is sent when the webhook is being tested by GCP.
 
-    In this case, the webhook receives a payload where the content if an
-    Incident object and the `version` field is set to "test".
+def parse_notification(data: bytes) -> ErrorReporting | TestNotification:
+    """Parse a notification, whatever its kind.
 
-    Anything is *not* considered a test notification.
+    Raises `pydantic.ValidationError` if the notification is invalid.
     """
 
-    try:
-        return request.json is not None and request.json.get("version") == "test"
-    except:  # noqa: E722
-        return False
+    notification: ErrorReporting | TestNotification = _NOTIFICATION.validate_json(
+        fix_escapes(data)
+    )
+    return notification
+
+
+def notification_from_request(
+    request: flask.Request,
+) -> ErrorReporting | TestNotification:
+    """Parse the notification received by the webhook, see `parse_notification()`."""
+
+    content_type = request.headers.get("content-type")
+    if content_type != "application/json":
+        raise ValueError(f"Invalid request content type: {content_type}")
+
+    LOGGER.debug("Received a notification", notification=request.data)
+    return parse_notification(request.data)
@@ -0,0 +1,39 @@
+from base64 import b64encode
+
+from ..http import check_status_json
+from ..http import shared_client
+from ..tracing import get_tracer
+from .auth import auth_headers
+
+PUBSUB_API = "https://pubsub.googleapis.com/v1"
+
+
+async def publish(
+    topic: str, data: bytes, attributes: dict[str, str] | None = None
+) -> str:
+    """Publish a message to a Pub/Sub topic, and return its message ID.
+
+    `topic` is the full name of the topic: `projects/<project>/topics/<name>`.
+
+    See: https://cloud.google.com/pubsub/docs/reference/rest/v1/projects.topics/publish
+    """
+
+    tracer = get_tracer(__name__)
+
+    with tracer.start_as_current_span("Pub/Sub: publish") as span:
+        span.set_attribute("pubsub.topic", topic)
+
+        message = {
+            "data": b64encode(data).decode("ascii"),
+            "attributes": attributes or {},
+        }
+        r = await shared_client().post(
+            f"{PUBSUB_API}/{topic}:publish",
+            json={"messages": [message]},
+            headers=await auth_headers(),
+        )
+        check_status_json(r)
+
+        message_id: str = r.json()["messageIds"][0]
+        span.set_attribute("pubsub.message_id", message_id)
+        return message_id
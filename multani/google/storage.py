@@ -0,0 +1,51 @@
+from urllib.parse import quote
+
+from ..http import check_status_json
+from ..http import shared_client
+from ..tracing import get_tracer
+from .auth import auth_headers
+
+STORAGE_API = "https://storage.googleapis.com/storage/v1"
+UPLOAD_API = "https://storage.googleapis.com/upload/storage/v1"
+
+
+class GCSObjectStore:
+    """Read and write objects of a Google Cloud Storage bucket.
+
+    See: https://cloud.google.com/storage/docs/json_api/v1/objects
+    """
+
+    def __init__(self, bucket: str) -> None:
+        self.bucket = bucket
+        self.tracer = get_tracer(__name__)
+
+    async def get(self, name: str) -> bytes | None:
+        """Get the content of an object, None if it doesn't exist."""
+
+        with self.tracer.start_as_current_span("GCS: get object") as span:
+            span.set_attribute("gcs.bucket", self.bucket)
+            span.set_attribute("gcs.object", name)
+
+            url = f"{STORAGE_API}/b/{self.bucket}/o/{quote(name, safe='')}"
+            r = await shared_client().get(
+                url, params={"alt": "media"}, headers=await auth_headers()
+            )
+            if r.status_code == 404:
+                return None
+
+            check_status_json(r)
+            return r.content
+
+    async def put(self, name: str, data: bytes) -> None:
+        """Create or replace an object."""
+
+        with self.tracer.start_as_current_span("GCS: put object") as span:
+            span.set_attribute("gcs.bucket", self.bucket)
+            span.set_attribute("gcs.object", name)
+
+            url = f"{UPLOAD_API}/b/{self.bucket}/o"
+            params = {"uploadType": "media", "name": name}
+            r = await shared_client().post(
+                url, params=params, content=data, headers=await auth_headers()
+            )
+            check_status_json(r)
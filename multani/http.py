@@ -1,8 +1,213 @@
+import asyncio
+import random
+import time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Awaitable
+from typing import Callable
+from weakref import WeakKeyDictionary
+
 import httpx
+import structlog
 from flask import Request
 from flask import Response
 from flask import abort
 
+from .tracing import get_current_span
+
+LOGGER = structlog.get_logger()
+
+# Errors raised before the request was sent: they are safe to retry, even for
+# non-idempotent requests.
+RETRYABLE_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+# The connection pool of the shared HTTP clients.
+POOL_LIMITS = httpx.Limits(
+    max_connections=64,
+    max_keepalive_connections=32,
+    keepalive_expiry=120,
+)
+TIMEOUT = httpx.Timeout(30, connect=10)
+
+_CLIENTS: WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient] = (
+    WeakKeyDictionary()
+)
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """How to retry a single HTTP call.
+
+    The delay before a retry is chosen randomly between 0 and `base_delay *
+    2**attempt`, capped to `max_delay` ("full jitter"), unless the response
+    specifies a `Retry-After` delay.
+    """
+
+    max_attempts: int = 5
+    base_delay: float = 0.5
+    max_delay: float = 30.0
+    statuses: frozenset[int] = frozenset({429, 502, 503, 504})
+
+    def delay(self, attempt: int, response: httpx.Response | None) -> float | None:
+        """How long to wait before the next attempt, None to give up."""
+
+        backoff = random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+
+        if response is not None:
+            wait = retry_after(response)
+            if wait is not None:
+                if wait > self.max_delay:
+                    return None
+                # Add a bit of jitter, so that all the throttled clients don't
+                # come back at the same time.
+                return wait + random.uniform(0, self.base_delay)
+
+        return backoff
+
+
+class RetryBudget:
+    """A retry budget, shared between many HTTP calls.
+
+    Each call deposits `ratio` into the budget, and each retry withdraws 1
+    from it: during an outage, the retries can't add more than `ratio` extra
+    load on the remote server, instead of multiplying it by the number of
+    attempts.
+    """
+
+    def __init__(self, ratio: float = 0.2, initial: float = 10, maximum: float = 100):
+        self.ratio = ratio
+        self.maximum = maximum
+        self.balance = initial
+
+        self.retries = 0
+        self.exhausted = 0
+
+    def deposit(self) -> None:
+        self.balance = min(self.maximum, self.balance + self.ratio)
+
+    def withdraw(self) -> bool:
+        if self.balance < 1:
+            self.exhausted += 1
+            return False
+
+        self.balance -= 1
+        self.retries += 1
+        return True
+
+
+def retry_after(response: httpx.Response) -> float | None:
+    """Parse the delay requested by the server before retrying, in seconds."""
+
+    value = response.headers.get("retry-after")
+    if value is None and response.status_code == 429:
+        # Terraform Cloud only specifies when its rate limit resets.
+        value = response.headers.get("x-ratelimit-reset")
+
+    if value is None:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+
+    delay: float = date.timestamp() - time.time()
+    return max(0.0, delay)
+
+
+async def send_with_retry(
+    send: Callable[[], Awaitable[httpx.Response]],
+    policy: RetryPolicy = RetryPolicy(),
+    budget: RetryBudget | None = None,
+) -> httpx.Response:
+    """Send a request, and retry it on transient errors.
+
+    The last response is returned if the request can't be retried anymore,
+    and the last error is raised if the request couldn't be sent at all.
+    """
+
+    span = get_current_span()
+    attempt = 1
+
+    while True:
+        if budget is not None:
+            budget.deposit()
+
+        response: httpx.Response | None = None
+        try:
+            response = await send()
+        except RETRYABLE_ERRORS as exc:
+            error: Exception = exc
+            reason = type(exc).__name__
+        else:
+            if response.status_code not in policy.statuses:
+                return response
+            reason = str(response.status_code)
+
+        delay = None
+        if attempt < policy.max_attempts:
+            delay = policy.delay(attempt, response)
+        if delay is not None and budget is not None and not budget.withdraw():
+            delay = None
+
+        if delay is None:
+            LOGGER.warning(
+                "Request failed after all its retries", attempts=attempt, reason=reason
+            )
+            span.add_event(
+                "http.retries_exhausted", {"http.attempts": attempt, "reason": reason}
+            )
+            if response is None:
+                raise error
+            return response
+
+        LOGGER.debug(
+            f"Retrying request in {delay:.2f}s", attempt=attempt, reason=reason
+        )
+        span.add_event(
+            "http.retry",
+            {"http.attempt": attempt, "http.retry_delay": delay, "reason": reason},
+        )
+
+        await asyncio.sleep(delay)
+        attempt += 1
+
+
+def shared_client() -> httpx.AsyncClient:
+    """Get the HTTP client shared by everything running in the current loop.
+
+    The client uses HTTP/2 and keeps its connections alive, so that the TLS
+    handshakes are paid once per event loop instead of once per call. httpx
+    clients can't be shared between event loops: one client is created per
+    loop, and it should be closed with `close_shared_client()` before the
+    loop stops.
+
+    Set the authentication headers on each request, not on the client: the
+    client may be used to talk to different services.
+    """
+
+    loop = asyncio.get_running_loop()
+    client = _CLIENTS.get(loop)
+
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(http2=True, limits=POOL_LIMITS, timeout=TIMEOUT)
+        _CLIENTS[loop] = client
+
+    return client
+
+
+async def close_shared_client() -> None:
+    """Close the HTTP client shared in the current loop, if there's one."""
+
+    client = _CLIENTS.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
 
 def check_status_json(response: httpx.Response) -> None:
     if response.status_code > 399:
@@ -3,20 +3,134 @@ from typing import Self
 
 from cloudevents.http import CloudEvent
 from pydantic import BaseModel
+from pydantic import Field
+from pydantic import field_validator
+from pydantic import model_validator
 
+from .tfcloud.models import WorkspaceRef
+from .tfcloud.selector import parse
+from .tfcloud.sharding import partition
+
+
+class OrganizationTrigger(BaseModel):
+    """Which workspaces of an organization to trigger."""
 
-class TerraformCloudTriggerAllRequest(BaseModel):
     organization: str
     secret_name: str
     tags_included: list[str] = []
     tags_excluded: list[str] = []
+    selector: str | None = None
+    # Trigger the workspaces with the highest priority tags first.
+    priorities: dict[str, int] = {}
+    # Split the workspaces into this many requests, processed concurrently.
+    shards: int = Field(default=1, ge=1)
+    # Wait for the runs to complete, and report their outcome.
+    wait: bool = False
+    # Only list the workspaces which would be triggered.
+    dry_run: bool = False
+
+    @field_validator("selector")
+    @classmethod
+    def check_selector(cls, value: str | None) -> str | None:
+        if value is not None:
+            parse(value)
+        return value
+
+
+class TerraformCloudTriggerAllRequest(OrganizationTrigger):
+    # Either a single organization, or several ones in `organizations`.
+    organization: str = ""
+    secret_name: str = ""
+    organizations: list[OrganizationTrigger] = []
+
+    # Only trigger these workspaces, instead of listing the organization.
+    workspaces: list[WorkspaceRef] | None = None
+    # The key of the checkpoint to use, if not the ID of the message.
+    checkpoint_key: str | None = None
+
+    # The ID of the Pub/Sub message which carried the request, if any.
+    message_id: str | None = Field(default=None, exclude=True)
+
+    @model_validator(mode="after")
+    def check_organizations(self) -> Self:
+        if self.organizations:
+            # The fields of each organization must be set in `organizations`:
+            # they would be ignored at the top level.
+            ignored = set(OrganizationTrigger.model_fields) & self.model_fields_set
+            if self.workspaces is not None:
+                ignored.add("workspaces")
+            if ignored:
+                fields = ", ".join(repr(name) for name in sorted(ignored))
+                raise ValueError(f"'organizations' can't be used with {fields}")
+        elif not (self.organization and self.secret_name):
+            raise ValueError("'organization' and 'secret_name' are required")
+
+        return self
 
     @classmethod
     def from_cloud_event(cls, event: CloudEvent) -> Self:
         """Parse a request from a Cloud Event message"""
 
-        raw_data = event.data["message"]["data"]
-        data = urlsafe_b64decode(raw_data).decode("utf-8")
+        message = event.data["message"]
+        data = urlsafe_b64decode(message["data"]).decode("utf-8")
         obj = cls.model_validate_json(data)
+        obj.message_id = message.get("messageId")
 
         return obj
+
+    def targets(self) -> list[Self]:
+        """Split this request into one request per organization.
+
+        Each organization gets its own checkpoint, derived from the
+        checkpoint of this request.
+        """
+
+        if not self.organizations:
+            return [self]
+
+        targets = []
+        for index, target in enumerate(self.organizations):
+            key = f"{self.checkpoint}-org-{index}" if self.checkpoint else None
+            targets.append(
+                type(self)(**dict(target), checkpoint_key=key, message_id=None)
+            )
+
+        return targets
+
+    @property
+    def checkpoint(self) -> str | None:
+        """The key of the checkpoint of this request."""
+
+        return self.checkpoint_key or self.message_id
+
+    def follow_up(self, remaining: list[WorkspaceRef], listed_all: bool) -> Self:
+        """Build the request to process the workspaces this request didn't.
+
+        If all the workspaces were listed, the follow-up request triggers the
+        `remaining` workspaces. Otherwise, it lists the workspaces again, and
+        relies on the checkpoint of this request to skip the workspaces
+        already triggered.
+        """
+
+        workspaces = remaining if listed_all else None
+        return self.model_copy(
+            update={"workspaces": workspaces, "checkpoint_key": self.checkpoint}
+        )
+
+    def shard_requests(self, workspaces: list[WorkspaceRef]) -> list[Self]:
+        """Split this request into one request per shard of `workspaces`.
+
+        Each shard request only triggers its own workspaces, with its own
+        checkpoint. Empty shards are skipped.
+        """
+
+        requests = []
+        for index, shard in enumerate(partition(workspaces, self.shards)):
+            if not shard:
+                continue
+
+            key = f"{self.checkpoint}-shard-{index}" if self.checkpoint else None
+            update = {"workspaces": shard, "shards": 1, "checkpoint_key": key}
+            requests.append(self.model_copy(update=update))
+
+        return requests
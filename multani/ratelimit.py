@@ -0,0 +1,167 @@
+"""Client-side rate limiting
+
+The `AdaptiveLimiter` combines:
+
+* a token bucket, which caps the rate of requests sent to an API to what the
+  API documents, and
+* an adjustable concurrency limit, which follows an AIMD (additive increase,
+  multiplicative decrease) strategy based on the latency and on the rate limit
+  headers of the responses: the concurrency grows slowly while the API answers
+  quickly, and is cut as soon as the API slows down or starts throttling.
+"""
+
+import asyncio
+import time
+from typing import Awaitable
+from typing import Callable
+
+import httpx
+import structlog
+
+LOGGER = structlog.get_logger()
+
+
+class TokenBucket:
+    """A token bucket, refilled continuously at `rate` tokens per second."""
+
+    def __init__(self, rate: float, capacity: float | None = None) -> None:
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float) -> None:
+        """Don't hand out any token for the next `seconds`."""
+
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0
+
+    async def acquire(self) -> None:
+        """Wait until a token is available, and consume it."""
+
+        # The lock keeps the waiters in order.
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+
+                elapsed = now - self._updated
+                self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+                self._updated = now
+
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class AdaptiveLimiter:
+    """Limit the rate and the concurrency of requests sent to an API.
+
+    The concurrency starts at `initial_concurrency` and is adjusted between
+    `min_concurrency` and `max_concurrency` after each response:
+
+    * it is increased by about 1 each time a full "window" of requests
+      completed below `target_latency`;
+    * it is multiplied by `backoff` when a response is throttled (HTTP 429) or
+      slower than `target_latency`, at most once per `target_latency` period;
+    * the token bucket is paused until the rate limit resets when the API
+      reports there are no more requests available.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: float | None = None,
+        initial_concurrency: int = 4,
+        min_concurrency: int = 1,
+        max_concurrency: int = 32,
+        target_latency: float = 2.0,
+        backoff: float = 0.5,
+    ) -> None:
+        self.bucket = TokenBucket(rate, burst)
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.target_latency = target_latency
+        self.backoff = backoff
+
+        self.concurrency = float(initial_concurrency)
+        self.in_flight = 0
+
+        self._condition = asyncio.Condition()
+        self._last_decrease = 0.0
+        self.logger = LOGGER.bind(kind="rate-limiter")
+
+    async def request(
+        self, send: Callable[[], Awaitable[httpx.Response]]
+    ) -> httpx.Response:
+        """Send a request once the limits allow it, and adapt to its response."""
+
+        async with self._condition:
+            await self._condition.wait_for(
+                lambda: self.in_flight < int(self.concurrency)
+            )
+            self.in_flight += 1
+
+        try:
+            await self.bucket.acquire()
+
+            start = time.monotonic()
+            response = await send()
+            self.observe(response, time.monotonic() - start)
+
+            return response
+        finally:
+            async with self._condition:
+                self.in_flight -= 1
+                self._condition.notify_all()
+
+    def observe(self, response: httpx.Response, latency: float) -> None:
+        """Adjust the limits from a response and from its latency."""
+
+        remaining = _parse_float(response.headers.get("x-ratelimit-remaining"))
+        reset = _parse_float(response.headers.get("x-ratelimit-reset"))
+
+        if response.status_code == 429:
+            self.bucket.pause(reset if reset is not None else 1.0)
+            self._decrease("throttled")
+        elif latency > self.target_latency:
+            self._decrease("slow response")
+        else:
+            # Additive increase: +1 for each "window" of successful requests.
+            self.concurrency = min(
+                self.max_concurrency, self.concurrency + 1 / self.concurrency
+            )
+
+        if remaining is not None and remaining < 1 and reset is not None:
+            self.bucket.pause(reset)
+
+    def _decrease(self, reason: str) -> None:
+        now = time.monotonic()
+
+        # All the requests in flight are likely to report the same problem:
+        # only react once per period.
+        if now - self._last_decrease < self.target_latency:
+            return
+
+        self._last_decrease = now
+        self.concurrency = max(self.min_concurrency, self.concurrency * self.backoff)
+        self.logger.debug(
+            f"Decreasing concurrency: {reason}", concurrency=int(self.concurrency)
+        )
+
+
+def _parse_float(value: str | None) -> float | None:
+    if value is None:
+        return None
+
+    try:
+        return float(value)
+    except ValueError:
+        return None
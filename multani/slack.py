@@ -1,58 +1,265 @@
+import asyncio
+import json
+import time
+from dataclasses import dataclass
+from dataclasses import replace
 from typing import Any
 from typing import Sequence
 
+import httpx
 import structlog
+from opentelemetry import trace
 from opentelemetry.trace import Status
 from opentelemetry.trace import StatusCode
-from slack_sdk import WebClient
 from slack_sdk.errors import SlackApiError
-from slack_sdk.models.blocks import Block
 
+from .http import RetryPolicy
+from .http import check_status_json
+from .http import retry_after
+from .http import send_with_retry
+from .http import shared_client
 from .tracing import get_tracer
 
-__all__ = ["SlackApiError", "SlackClient"]
+__all__ = [
+    "AsyncSlackClient",
+    "Attachment",
+    "ChannelScheduler",
+    "SlackApiError",
+    "SlackMessage",
+]
 
+SLACK_API = "https://slack.com/api"
+# Slack allows about one message per second in each channel.
+CHANNEL_INTERVAL = 1.0
 
-class SlackClient:
-    def __init__(self, token: str) -> None:
-        self.client = WebClient(token=token)
+
+@dataclass
+class Attachment:
+    """A file to upload in the thread of a message."""
+
+    filename: str
+    content: str
+    title: str | None = None
+
+
+@dataclass
+class SlackMessage:
+    channel_id: str
+    blocks: list[dict[Any, Any]] | None = None
+    text: str | None = None
+    icon_emoji: str | None = None
+    # The messages of the same group are coalesced, see `slack_coalescing`.
+    group: str | None = None
+    attachment: Attachment | None = None
+
+
+class ChannelScheduler:
+    """Space the messages sent to each channel by `interval` seconds.
+
+    Each call reserves the next free slot of its channel, then waits for it:
+    the calls to a channel are spread over time, while the calls to the
+    other channels are not delayed.
+    """
+
+    def __init__(self, interval: float = CHANNEL_INTERVAL) -> None:
+        self.interval = interval
+        self._next: dict[str, float] = {}
+
+    async def wait(self, channel_id: str) -> float:
+        """Wait for the next slot of `channel_id`, return how long it took."""
+
+        now = time.monotonic()
+        at = max(now, self._next.get(channel_id, now))
+        self._next[channel_id] = at + self.interval
+
+        if at > now:
+            await asyncio.sleep(at - now)
+        return at - now
+
+    def pause(self, channel_id: str, seconds: float) -> None:
+        """Don't send anything to `channel_id` for the next `seconds`."""
+
+        at = time.monotonic() + seconds
+        self._next[channel_id] = max(self._next.get(channel_id, at), at)
+
+
+class AsyncSlackClient:
+    """A Slack Web API client, over the HTTP client shared in the current loop.
+
+    The connections to Slack are kept alive between invocations. The calls
+    to each channel are spaced by the `scheduler`, which should be shared by
+    all the clients; the throttled calls are retried after the delay
+    requested by Slack, the others with a backoff.
+
+    The calls posting to a channel are not idempotent: a gateway error may
+    be returned after Slack posted the message. They are only retried when
+    throttled, or when they couldn't be sent at all.
+    """
+
+    def __init__(
+        self,
+        token: str,
+        scheduler: ChannelScheduler | None = None,
+        http: httpx.AsyncClient | None = None,
+        retry_policy: RetryPolicy = RetryPolicy(),
+    ) -> None:
+        self.token = token
+        self.scheduler = scheduler or ChannelScheduler()
+        self.http = http or shared_client()
+        self.retry_policy = retry_policy
         self.logger = structlog.get_logger()
         self.tracer = get_tracer(__name__)
 
-    def post_message(
+    async def post_message(
         self,
         channel_id: str,
-        blocks: str | Sequence[dict[Any, Any] | Block] | None = None,
+        blocks: Sequence[dict[Any, Any]] | None = None,
         text: str | None = None,
         icon_emoji: str | None = None,
-    ) -> None:
-        """Post a Slack message.
+    ) -> str:
+        """Post a Slack message, and return its timestamp.
 
         See: https://api.slack.com/methods/chat.postMessage
         """
 
-        logger = self.logger.bind(slack_channel_id=channel_id)
-
-        if blocks is None and text is None:
+        if (blocks is None) == (text is None):
             raise ValueError("Need one of `blocks` or `text`")
 
-        if blocks is not None and text is not None:
-            raise ValueError("Need one of `blocks` or `text`")
+        payload = {
+            "channel": channel_id,
+            "blocks": blocks,
+            "text": text,
+            "icon_emoji": icon_emoji,
+        }
+        with self.tracer.start_as_current_span("Slack: post message"):
+            response = await self._call(
+                "chat.postMessage", channel_id, payload, idempotent=False
+            )
+            return str(response["ts"])
 
-        with self.tracer.start_as_current_span("Slack: post message") as span:
+    async def update_message(
+        self,
+        channel_id: str,
+        ts: str,
+        blocks: Sequence[dict[Any, Any]] | None = None,
+        text: str | None = None,
+    ) -> None:
+        """Update a Slack message previously posted.
+
+        See: https://api.slack.com/methods/chat.update
+        """
+
+        payload = {"channel": channel_id, "ts": ts, "blocks": blocks, "text": text}
+        with self.tracer.start_as_current_span("Slack: update message"):
+            await self._call("chat.update", channel_id, payload)
+
+    async def upload_file(
+        self,
+        channel_id: str,
+        filename: str,
+        content: bytes,
+        title: str | None = None,
+        thread_ts: str | None = None,
+    ) -> str:
+        """Share a file in a channel, or in a thread, and return its ID.
+
+        See: https://api.slack.com/messaging/files#uploading_files
+        """
+
+        with self.tracer.start_as_current_span("Slack: upload file") as span:
+            span.set_attribute("slack.file_size", len(content))
+
+            # The file is only shared by the last call: the previous ones don't
+            # count in the rate limit of the channel.
+            upload = await self._call(
+                "files.getUploadURLExternal",
+                None,
+                {"filename": filename, "length": len(content)},
+                form=True,
+            )
+
+            r = await send_with_retry(
+                lambda: self.http.post(upload["upload_url"], content=content),
+                self.retry_policy,
+            )
+            check_status_json(r)
+
+            files = [{"id": upload["file_id"], "title": title or filename}]
+            payload = {
+                "files": json.dumps(files),
+                "channel_id": channel_id,
+                "thread_ts": thread_ts,
+            }
+            await self._call(
+                "files.completeUploadExternal",
+                channel_id,
+                payload,
+                form=True,
+                idempotent=False,
+            )
+            return str(upload["file_id"])
+
+    async def _call(
+        self,
+        method: str,
+        channel_id: str | None,
+        payload: dict[str, Any],
+        form: bool = False,
+        idempotent: bool = True,
+    ) -> dict[str, Any]:
+        """Call a method of the Web API, spaced with the other calls to the channel.
+
+        The payload is sent as JSON, or as a form if `form` is set, for the
+        methods which don't accept JSON. If the method is not `idempotent`,
+        it's only retried when throttled, or when it couldn't be sent.
+        """
+
+        logger = self.logger.bind(slack_channel_id=channel_id, slack_method=method)
+        span = trace.get_current_span()
+        if channel_id is not None:
             span.set_attribute("slack-channel-id", channel_id)
-            logger.debug("Posting message to Slack")
-            try:
-                response = self.client.chat_postMessage(
-                    channel=channel_id,
-                    text=text,
-                    blocks=blocks,
-                    icon_emoji=icon_emoji,
+
+        headers = {"Authorization": f"Bearer {self.token}"}
+        body = {key: value for key, value in payload.items() if value is not None}
+        queue_wait = 0.0
+
+        async def send() -> httpx.Response:
+            nonlocal queue_wait
+
+            # Each attempt, retries included, waits for a slot of the channel.
+            if channel_id is not None:
+                queue_wait += await self.scheduler.wait(channel_id)
+
+            url = f"{SLACK_API}/{method}"
+            if form:
+                r = await self.http.post(url, data=body, headers=headers)
+            else:
+                r = await self.http.post(url, json=body, headers=headers)
+
+            if r.status_code == 429 and channel_id is not None:
+                # Hold the other messages to the channel back too.
+                self.scheduler.pause(channel_id, retry_after(r) or CHANNEL_INTERVAL)
+            return r
+
+        retry_policy = self.retry_policy
+        if not idempotent:
+            retry_policy = replace(retry_policy, statuses=frozenset({429}))
+
+        logger.debug("Calling Slack")
+        try:
+            r = await send_with_retry(send, retry_policy)
+            span.set_attribute("slack.queue_wait", queue_wait)
+            check_status_json(r)
+            response: dict[str, Any] = r.json()
+            if not response.get("ok"):
+                raise SlackApiError(  # type: ignore[no-untyped-call]
+                    f"Slack error: {response.get('error')}", response
                 )
-            except SlackApiError as exc:
-                logger.exception("Unable to send Slack message", exception=exc)
-                span.set_status(Status(StatusCode.ERROR))
-                span.record_exception(exc)
-                raise exc from None
+        except (httpx.HTTPError, SlackApiError) as exc:
+            logger.exception("Unable to call Slack", exception=exc)
+            span.set_status(Status(StatusCode.ERROR))
+            span.record_exception(exc)
+            raise
 
-            logger.debug("Slack response", slack_response=response.data)
+        logger.debug("Slack response", slack_response=response, queue_wait=queue_wait)
+        return response
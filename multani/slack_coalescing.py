@@ -0,0 +1,191 @@
+"""Coalesce the repeated notifications of the same error group
+
+During an incident, Error Reporting notifies the same error group again and
+again. Instead of posting a new Slack message for each notification:
+
+* the first notification of a group posts the full message;
+* the next ones, during `window` seconds, only increment a counter, which is
+  shown on the first message by updating it with `chat.update`;
+* the updates are debounced: the message is updated at most once every
+  `update_delay` seconds, with the latest count.
+
+The number of Slack calls depends on the number of groups, not on the number
+of notifications. The groups are kept in a bounded LRU, and everything runs
+in a single event loop, so there is no locking.
+
+The notifications received while the first message of their group is being
+posted wait for it: if it can't be posted, they post their own message
+instead, so that no notification is lost. The updates of the count run
+after the webhooks were answered, while Cloud Functions may throttle the
+instance: the count shown is only best-effort.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from dataclasses import field
+from typing import Any
+from typing import Awaitable
+from typing import Callable
+
+import structlog
+from opentelemetry.trace import get_current_span
+
+from .slack import SlackMessage
+
+LOGGER = structlog.get_logger()
+
+# How long the notifications of a group update the same message, in seconds.
+WINDOW = 3600.0
+# How long to wait for more notifications before updating the message.
+UPDATE_DELAY = 10.0
+# How many groups to remember.
+MAX_GROUPS = 256
+
+Post = Callable[[SlackMessage], Awaitable[str]]
+Update = Callable[[SlackMessage, str], Awaitable[None]]
+
+
+@dataclass
+class ErrorGroup:
+    message: SlackMessage
+    first_seen: float = field(default_factory=time.time)
+    count: int = 1
+    # The count shown on the message.
+    shown: int = 1
+    # The timestamp of the message, once posted.
+    ts: str | None = None
+    posted: asyncio.Event = field(default_factory=asyncio.Event)
+    update: asyncio.Task[None] | None = None
+
+    def expired(self, window: float, now: float) -> bool:
+        return now - self.first_seen > window
+
+    def updated_message(self) -> SlackMessage:
+        """The first message, with the number of notifications received."""
+
+        blocks: list[dict[Any, Any]] = list(self.message.blocks or [])
+        blocks.append(
+            {
+                "type": "context",
+                "elements": [
+                    {
+                        "type": "mrkdwn",
+                        "text": (
+                            f"🔁 Seen {self.count} times since "
+                            f"<!date^{int(self.first_seen)}^{{time}}|the first time>"
+                        ),
+                    }
+                ],
+            }
+        )
+        return SlackMessage(
+            self.message.channel_id,
+            blocks=blocks,
+            text=self.message.text,
+            icon_emoji=self.message.icon_emoji,
+        )
+
+
+class ErrorCoalescer:
+    """Post the first message of each group, update it for the next ones."""
+
+    def __init__(
+        self,
+        post: Post,
+        update: Update,
+        window: float = WINDOW,
+        update_delay: float = UPDATE_DELAY,
+        max_groups: int = MAX_GROUPS,
+    ) -> None:
+        self.post = post
+        self.update = update
+        self.window = window
+        self.update_delay = update_delay
+        self.max_groups = max_groups
+
+        self.groups: OrderedDict[str, ErrorGroup] = OrderedDict()
+        self.logger = LOGGER.bind(kind="slack-coalescing")
+
+    async def notify(self, message: SlackMessage) -> None:
+        """Post `message`, or count it in the message of its group.
+
+        Raises the error of the post, if `message` had to be posted and
+        couldn't be.
+        """
+
+        span = get_current_span()
+
+        if message.group is None:
+            await self.post(message)
+            return
+
+        while True:
+            group = self.groups.get(message.group)
+            if group is None or group.expired(self.window, time.time()):
+                break
+
+            if not group.posted.is_set():
+                # The first message of the group is being posted.
+                await group.posted.wait()
+                continue
+
+            self.groups.move_to_end(message.group)
+            group.count += 1
+            if group.update is None:
+                group.update = asyncio.create_task(self._update_later(group))
+            span.set_attribute("slack.coalesced", True)
+            self.logger.debug("Notification coalesced", count=group.count)
+            return
+
+        group = ErrorGroup(message)
+        self.groups[message.group] = group
+        self.groups.move_to_end(message.group)
+        while len(self.groups) > self.max_groups:
+            self.groups.popitem(last=False)
+
+        try:
+            group.ts = await self.post(message)
+        except Exception:
+            # The notifications waiting for this message post their own.
+            if self.groups.get(message.group) is group:
+                del self.groups[message.group]
+            raise
+        finally:
+            group.posted.set()
+
+        span.set_attribute("slack.coalesced", False)
+
+    async def _update_later(self, group: ErrorGroup) -> None:
+        await asyncio.sleep(self.update_delay)
+        group.update = None
+        await self._update(group)
+
+    async def _update(self, group: ErrorGroup) -> None:
+        await group.posted.wait()
+        if group.ts is None or group.shown == group.count:
+            return
+
+        count = group.count
+        try:
+            await self.update(group.updated_message(), group.ts)
+        except Exception as exc:
+            self.logger.exception("Unable to update Slack message", exception=exc)
+            return
+
+        group.shown = count
+
+    async def flush(self) -> None:
+        """Update the messages with pending notifications right away."""
+
+        pending = [group for group in self.groups.values() if group.update]
+        tasks = []
+        for group in pending:
+            assert group.update is not None
+            group.update.cancel()
+            tasks.append(group.update)
+            group.update = None
+
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await asyncio.gather(*[self._update(group) for group in pending])
@@ -0,0 +1,148 @@
+"""Render the Error Reporting notifications as Slack messages
+
+The blocks of the message are built as dicts, and serialized once, by the
+HTTP client posting them. The size of their JSON payload is computed from
+the size of the serialized values of the error, and the size of the blocks
+without the values, computed once.
+
+Slack limits the length of the text of each block: the values are truncated
+to these limits, keeping the start and the end of the text (the end of a
+traceback is usually its most useful part.) When the log message is
+truncated, it is also attached in full to the Slack message, as a snippet.
+"""
+
+import json
+import time
+from dataclasses import dataclass
+from functools import cache
+from typing import Any
+
+from opentelemetry.trace import get_current_span
+
+from .google.models import ErrorReporting
+from .slack import Attachment
+from .tracing import get_tracer
+
+# The limits of the text of the blocks, in characters.
+# https://api.slack.com/reference/block-kit/blocks
+HEADER_LIMIT = 150
+FIELD_LIMIT = 2000
+LOG_MESSAGE_LIMIT = 3000
+# How many characters of the limits the labels of the fields may take.
+LABEL_MARGIN = 20
+# The share of a truncated text kept from its start, the rest is kept from
+# its end.
+HEAD = 0.25
+
+
+@dataclass
+class RenderedError:
+    blocks: list[dict[str, Any]]
+    # The size of the blocks, serialized to JSON, in bytes.
+    size: int
+    # The full log message, if it was truncated.
+    attachment: Attachment | None = None
+
+
+def truncate(text: str, limit: int, head: float = HEAD) -> str:
+    """Truncate `text` to `limit` characters, keeping its start and its end.
+
+    >>> truncate("abcdefghijklmnopqrstuvwxyz" * 4, 40, head=0.5)
+    'abcdefghijk\\n[… 81 chars …]\\nopqrstuvwxyz'
+    >>> truncate("short", 40)
+    'short'
+    """
+
+    if len(text) <= limit:
+        return text
+
+    # The length of the marker depends on the number of characters removed,
+    # which depends on the length of the marker: reserve enough room for it.
+    room = limit - len(f"\n[… {len(text)} chars …]\n")
+    kept_head = int(room * head)
+    kept_tail = room - kept_head
+    removed = len(text) - kept_head - kept_tail
+
+    tail = text[len(text) - kept_tail :] if kept_tail else ""
+    return f"{text[:kept_head]}\n[… {removed} chars …]\n{tail}"
+
+
+def _blocks(
+    subject: str, type: str, message: str, detail_link: str, log_message: str
+) -> list[dict[str, Any]]:
+    return [
+        {
+            "type": "header",
+            "text": {"type": "plain_text", "text": f"🚨 {subject}", "emoji": True},
+        },
+        {
+            "type": "section",
+            "fields": [
+                {"type": "mrkdwn", "text": f"*Type:*\n`{type}`"},
+                {"type": "mrkdwn", "text": f"*Message:*\n{message}"},
+                {"type": "mrkdwn", "text": f"<{detail_link}|ℹ️  View error>"},
+            ],
+        },
+        {
+            "type": "rich_text",
+            "elements": [
+                {
+                    "type": "rich_text_preformatted",
+                    "elements": [{"type": "text", "text": log_message}],
+                },
+            ],
+        },
+    ]
+
+
+def _json_size(value: Any) -> int:
+    return len(json.dumps(value, ensure_ascii=False).encode("utf-8"))
+
+
+@cache
+def _skeleton_size() -> int:
+    """The size of the JSON blocks, without the values of the error."""
+
+    return _json_size(_blocks("", "", "", "", ""))
+
+
+def render_error(error: ErrorReporting, head: float = HEAD) -> RenderedError:
+    """Render an error as Slack blocks, within the limits of Slack.
+
+    `head` is the share of the truncated texts kept from their start.
+    """
+
+    tracer = get_tracer(__name__)
+
+    with tracer.start_as_current_span("Slack: render message"):
+        start = time.perf_counter()
+
+        log_message = error.event_info.log_message
+        values = {
+            "subject": truncate(error.subject, HEADER_LIMIT - LABEL_MARGIN, head),
+            "type": truncate(
+                error.exception_info.type, FIELD_LIMIT - LABEL_MARGIN, head
+            ),
+            "message": truncate(
+                error.exception_info.message, FIELD_LIMIT - LABEL_MARGIN, head
+            ),
+            "detail_link": error.group_info.detail_link,
+            "log_message": truncate(log_message, LOG_MESSAGE_LIMIT, head),
+        }
+        truncated = values["log_message"] != log_message
+
+        # Each value is serialized as a string, without its quotes.
+        size = _skeleton_size() + sum(
+            _json_size(value) - 2 for value in values.values()
+        )
+        rendered = RenderedError(_blocks(**values), size)
+        if truncated:
+            rendered.attachment = Attachment(
+                "traceback.txt", log_message, title=f"Traceback of {error.subject}"
+            )
+
+        span = get_current_span()
+        span.set_attribute("slack.payload_size", rendered.size)
+        span.set_attribute("slack.render_time", time.perf_counter() - start)
+        span.set_attribute("slack.truncated", truncated)
+        return rendered
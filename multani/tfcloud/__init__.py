@@ -1,3 +1,5 @@
+from .client import DeadlineExceeded
 from .client import TerraformCloud
+from .client import default_limiter
 
-__all__ = ["TerraformCloud"]
+__all__ = ["DeadlineExceeded", "TerraformCloud", "default_limiter"]
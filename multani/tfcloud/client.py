@@ -1,135 +1,641 @@
 import asyncio
+import time
+from dataclasses import dataclass
+from dataclasses import field
+from dataclasses import replace
+from itertools import count
+from itertools import islice
+from math import inf
+from typing import Any
+from typing import AsyncIterator
+from typing import Awaitable
+from typing import Callable
 
 import httpx
 import structlog
+from opentelemetry.trace import Span
 
+from ..checkpoint import Checkpoint
+from ..deadline import Deadline
+from ..http import RetryBudget
+from ..http import RetryPolicy
 from ..http import check_status_json
+from ..http import send_with_retry
+from ..ratelimit import AdaptiveLimiter
 from ..tracing import get_tracer
-from .models import ListWorkspacesResponse
-from .models import RunCreateRequest
+from .inventory import CachedPage
+from .inventory import CachePolicy
+from .inventory import InventoryCache
+from .models import ListRunsResponse
 from .models import RunCreateResponse
-from .models import Workspace
+from .models import WorkspacePage
+from .models import WorkspaceRecord
+from .models import WorkspaceRef
+from .models import run_create_body
+from .models import validate_json
+from .report import TriggerReport
+from .report import WorkspaceResult
+from .report import WorkspaceStatus
+from .runs import RunTracker
+from .selector import Selector
 
 LOGGER = structlog.get_logger()
 TF_CLOUD_BASE = "https://app.terraform.io"
 TF_CLOUD_API = f"{TF_CLOUD_BASE}/api/v2"
 
+# The maximum page size allowed by the API.
+PAGE_SIZE = 100
+# Only fetch the attributes of the workspaces used to select them, and the
+# status of their current run.
+# https://developer.hashicorp.com/terraform/cloud-docs/api-docs#sparse-fieldsets
+WORKSPACE_FIELDS = ["name", "tag-names", "execution-mode", "current-run"]
+RUN_FIELDS = ["status"]
+# The statuses the requests which are not idempotent are retried on: the
+# request wasn't handled by Terraform Cloud.
+NON_IDEMPOTENT_STATUSES = frozenset({429, 503})
+# How many pages of workspaces can be fetched at the same time.
+PAGE_CONCURRENCY = 8
+# How many runs can be created at the same time, at most: the actual
+# concurrency is decided by the rate limiter.
+TRIGGER_WORKERS = 32
+# https://developer.hashicorp.com/terraform/cloud-docs/api-docs#rate-limiting
+RATE_LIMIT = 30
+# How long before the deadline to stop creating runs, in seconds, to leave
+# time to hand the remaining workspaces over.
+DEADLINE_MARGIN = 10.0
+# How long before the deadline to stop listing the workspaces, when they are
+# prioritized: no run is created before the listing stops.
+PRIORITY_LISTING_MARGIN = 2 * DEADLINE_MARGIN
+# The expected time to create a run, before it's actually measured.
+INITIAL_LATENCY = 1.0
+
+# (-priority, insertion order, workspace, queued at), None marks the end of
+# the queue.
+QueueItem = tuple[float, int, WorkspaceRef | None, float]
+
+
+def default_limiter() -> AdaptiveLimiter:
+    """The rate limiter for the Terraform Cloud API.
+
+    Share it between the clients talking to Terraform Cloud at the same time,
+    so that they stay within the rate limit altogether.
+    """
+
+    return AdaptiveLimiter(RATE_LIMIT, max_concurrency=TRIGGER_WORKERS)
+
+
+@dataclass
+class ListingStats:
+    """Statistics about the listing of the workspaces of an organization."""
+
+    # How many workspaces were listed
+    listed: int = 0
+    # How many workspaces matched the selector
+    selected: int = 0
+    # The selected workspaces skipped, because of an active run
+    skipped_active: list[WorkspaceRef] = field(default_factory=list)
+
+    # How many pages were requested to the API
+    pages: int = 0
+    # How long the listing took, in seconds, including the time spent by the
+    # consumer of the workspaces.
+    elapsed: float = 0.0
+    # How long the API requests took, in seconds: the pages are fetched
+    # concurrently, so this can be longer than `elapsed`.
+    fetch_time: float = 0.0
+    # How long parsing and filtering the pages took, in seconds.
+    parse_time: float = 0.0
+    filter_time: float = 0.0
+    # How many pages were found in the inventory cache, per result ("hit",
+    # "revalidated" or "miss").
+    inventory: dict[str, int] = field(default_factory=dict)
+
+    def timings(self) -> dict[str, float]:
+        return {
+            "elapsed": round(self.elapsed, 3),
+            "fetch": round(self.fetch_time, 3),
+            "parse": round(self.parse_time, 3),
+            "filter": round(self.filter_time, 3),
+        }
+
+
+class DeadlineExceeded(Exception):
+    """Not all the workspaces could be triggered before the deadline."""
+
+    def __init__(self, report: TriggerReport) -> None:
+        remaining = report.deferred
+        super().__init__(f"{len(remaining)} workspaces not triggered")
+        self.report = report
+        # The workspaces listed but not triggered.
+        self.remaining = remaining
+        # Were all the workspaces listed? If not, some workspaces which were
+        # not listed are not in `remaining`.
+        self.listed_all = report.listed_all
+
 
 class TerraformCloud:
-    def __init__(self, http: httpx.AsyncClient, token: str):
+    def __init__(
+        self,
+        http: httpx.AsyncClient,
+        token: str,
+        limiter: AdaptiveLimiter | None = None,
+        retry_policy: RetryPolicy = RetryPolicy(),
+        retry_budget: RetryBudget | None = None,
+        inventory: InventoryCache | None = None,
+    ):
         self.http = http
         self.token = token
 
+        if limiter is None:
+            limiter = default_limiter()
+        self.limiter = limiter
+        self.retry_policy = retry_policy
+        self.retry_budget = retry_budget or RetryBudget()
+        self.inventory = inventory
+
         self.logger = LOGGER.bind()
         self.tracer = get_tracer(__name__)
 
-        http.headers["Content-Type"] = "application/vnd.api+json"
+        # The HTTP client may be shared with other API clients: set the
+        # headers on each request.
+        self.headers = {"Content-Type": "application/vnd.api+json"}
         if token:
-            http.headers["Authorization"] = f"Bearer {token}"
+            self.headers["Authorization"] = f"Bearer {token}"
 
     async def trigger_all(
         self,
         org: str,
         includes: list[str],
         excludes: list[str],
-    ) -> bool:
+        selector: str | None = None,
+        workers: int = TRIGGER_WORKERS,
+        skip_active: bool = True,
+        checkpoint: Checkpoint | None = None,
+        deadline: Deadline | None = None,
+        priorities: dict[str, int] | None = None,
+        workspaces: list[WorkspaceRef] | None = None,
+        tracker: RunTracker | None = None,
+    ) -> TriggerReport:
+        """Start a new run in all the matching workspaces of `org`.
+
+        The workspaces are pushed onto a bounded queue as soon as their page
+        has been fetched, and a fixed pool of `workers` creates the runs from
+        that queue: runs are created while the remaining pages are still being
+        fetched, and the memory used doesn't depend on the size of the
+        organization.
+
+        If `skip_active` is set, the workspaces with a run still in progress
+        are skipped.
+
+        If a `checkpoint` is passed, the workspaces it contains are skipped,
+        and the workspaces where a run is created are added to it.
+
+        `priorities` maps tags to priorities: the workspaces with the highest
+        priority tag are triggered first. All the workspaces are listed and
+        sorted before the first run is created in this case: the listing and
+        the run creation don't overlap anymore, and all the listed workspaces
+        are kept in memory. If the deadline gets close before all the
+        workspaces are listed, the runs are created in the workspaces listed
+        so far.
+
+        If a `deadline` is passed, no new run is created when the deadline
+        gets close: `DeadlineExceeded` is raised with the workspaces which
+        were not triggered.
+
+        If `workspaces` is passed, these workspaces are triggered instead of
+        listing the workspaces of the organization.
+
+        If a `tracker` is passed, the runs created are added to it, and
+        `trigger_all()` waits until they complete (or until the deadline).
+
+        Returns a report of what happened to each workspace.
+        """
+
         with self.tracer.start_span("Terraform Cloud: trigger all workspaces") as span:
             span.set_attribute("tfcloud.organization_name", org)
 
-            workspaces = await self.fetch_workspaces(org, includes, excludes)
+            queue: asyncio.PriorityQueue[QueueItem] = asyncio.PriorityQueue(workers * 2)
+            order = count()
+            report = TriggerReport(org)
+            stats = ListingStats()
+            latency = INITIAL_LATENCY
 
-            http_limiter = asyncio.Semaphore(3)
+            def out_of_time(margin: float) -> bool:
+                return deadline is not None and deadline.expired(margin)
 
-            async def trigger(org: str, name: str, id: str) -> None:
-                logger = self.logger.bind(org=org, workspace=name, workspace_id=id)
-                try:
-                    async with http_limiter:
-                        await self.workspace_create_run(org, name, id)
-                except Exception:
-                    logger.exception("Error while creating workspace run")
-                    raise
+            async def trigger() -> None:
+                nonlocal latency
 
-            awaitables = [trigger(org, ws.attributes.name, ws.id) for ws in workspaces]
-            results = await asyncio.gather(*awaitables, return_exceptions=True)
+                while True:
+                    _, _, ws, queued_at = await queue.get()
+                    if ws is None:
+                        break
 
-            for r, ws in zip(results, workspaces):
-                if isinstance(r, BaseException):
-                    self.logger.error("At least one trigger didn't work successfully.")
-                    return False
+                    if out_of_time(DEADLINE_MARGIN + latency):
+                        report.add(WorkspaceResult(ws, WorkspaceStatus.DEFERRED))
+                        continue
 
-            self.logger.info("All triggers completed successfully.")
-            return True
+                    start = time.monotonic()
+                    result = WorkspaceResult(
+                        ws, WorkspaceStatus.TRIGGERED, queue_wait=start - queued_at
+                    )
+                    try:
+                        result.run_id = await self.create_run(
+                            org, ws.name, ws.id, on_attempt=result.attempt
+                        )
+                        if tracker is not None:
+                            tracker.add(ws, result.run_id)
+                        if checkpoint is not None:
+                            await checkpoint.add(ws.id)
+                    except Exception as exc:
+                        result.status = WorkspaceStatus.FAILED
+                        result.error = str(exc)
+
+                    # Moving average of the time needed to create a run
+                    result.latency = time.monotonic() - start
+                    latency = 0.8 * latency + 0.2 * result.latency
+                    report.add(result)
+
+            async def enqueue(ws: WorkspaceRef) -> None:
+                if checkpoint is not None and ws.id in checkpoint:
+                    report.add(WorkspaceResult(ws, WorkspaceStatus.CHECKPOINTED))
+                    return
+
+                await queue.put((-ws.priority, next(order), ws, time.monotonic()))
+
+            async def produce() -> bool:
+                """Queue the workspaces, return whether all were listed."""
+
+                listed: list[WorkspaceRef] = []
+                listed_all = True
+                # Keep the remaining time to wrap up, and to create runs in
+                # the prioritized workspaces listed so far.
+                margin = PRIORITY_LISTING_MARGIN if priorities else DEADLINE_MARGIN / 2
+
+                if workspaces is not None:
+                    listed = list(workspaces)
+                else:
+                    refs = self.iter_workspace_refs(
+                        org,
+                        includes,
+                        excludes,
+                        selector,
+                        priorities,
+                        skip_active,
+                        stats,
+                    )
+                    async for ref in refs:
+                        if out_of_time(margin):
+                            listed_all = False
+                            break
 
-    async def fetch_workspaces(
+                        if priorities:
+                            listed.append(ref)
+                        else:
+                            await enqueue(ref)
+
+                if priorities:
+                    # The queue is bounded: sort all the workspaces first, the
+                    # workers would otherwise start with the first listed ones.
+                    listed.sort(key=lambda ref: -ref.priority)
+
+                for ref in listed:
+                    await enqueue(ref)
+
+                return listed_all
+
+            consumers = [asyncio.create_task(trigger()) for _ in range(workers)]
+
+            try:
+                listed_all = await produce()
+            except BaseException:
+                for consumer in consumers:
+                    consumer.cancel()
+                raise
+            else:
+                # Signal the end of the workspaces to each worker
+                for _ in consumers:
+                    await queue.put((inf, next(order), None, 0.0))
+
+                await asyncio.gather(*consumers)
+            finally:
+                if checkpoint is not None:
+                    await checkpoint.flush()
+
+            for ws in stats.skipped_active:
+                report.add(WorkspaceResult(ws, WorkspaceStatus.SKIPPED_ACTIVE))
+            report.listed_all = listed_all
+            report.listed = stats.listed
+            report.selected = stats.selected
+
+            checkpointed = report.counts()[WorkspaceStatus.CHECKPOINTED]
+            if checkpointed:
+                self.logger.info(
+                    f"Skipped {checkpointed} workspaces already triggered previously"
+                )
+
+            deferred = report.deferred
+            if deferred or not listed_all:
+                span.set_attributes(report.attributes())
+                self.logger.warning(
+                    f"Deadline reached, {len(deferred)} workspaces were not triggered",
+                    listed_all=listed_all,
+                )
+                raise DeadlineExceeded(report)
+
+            if tracker is not None:
+                wait_deadline = None
+                if deadline is not None:
+                    wait_deadline = Deadline(deadline.at - DEADLINE_MARGIN)
+
+                report.runs = await tracker.wait(wait_deadline)
+
+            span.set_attributes(report.attributes())
+
+            if report.failed:
+                self.logger.error("At least one trigger didn't work successfully.")
+            elif not report.succeeded:
+                self.logger.error("At least one run didn't complete successfully.")
+            else:
+                self.logger.info("All triggers completed successfully.")
+
+            return report
+
+    async def dry_run(
         self,
         org: str,
         includes: list[str],
         excludes: list[str],
-    ) -> list[Workspace]:
-        with self.tracer.start_as_current_span(
-            "Terraform Cloud: get workspaces"
-        ) as span:
+        selector: str | None = None,
+        priorities: dict[str, int] | None = None,
+        skip_active: bool = True,
+        workspaces: list[WorkspaceRef] | None = None,
+    ) -> tuple[list[WorkspaceRef], ListingStats]:
+        """List the workspaces `trigger_all()` would trigger, without triggering them.
+
+        Also returns the statistics of the listing, with its timings: the
+        inventory cache is bypassed, so that the timings are the ones of the
+        API. If `workspaces` is passed, they are returned without listing the
+        workspaces of the organization, like `trigger_all()` would trigger
+        them.
+        """
+
+        with self.tracer.start_as_current_span("Terraform Cloud: dry run") as span:
             span.set_attribute("tfcloud.organization_name", org)
 
-            self.logger.info("Fetching the list of workspaces")
+            stats = ListingStats()
+            if workspaces is None:
+                refs = self.iter_workspace_refs(
+                    org,
+                    includes,
+                    excludes,
+                    selector,
+                    priorities,
+                    skip_active,
+                    stats,
+                    cache=CachePolicy.BYPASS,
+                )
+                workspaces = [ref async for ref in refs]
 
-            # https://www.terraform.io/cloud-docs/api-docs/workspaces#list-workspaces
-            # TODO: implement paging
-            url = f"{TF_CLOUD_API}/organizations/{org}/workspaces"
-            r = await self.http.get(url)
-            check_status_json(r)
+            span.set_attribute("tfcloud.listed", stats.listed)
+            span.set_attribute("tfcloud.selected", stats.selected)
+            for name, value in stats.timings().items():
+                span.set_attribute(f"tfcloud.time.{name}", value)
+
+            return workspaces, stats
+
+    async def fetch_workspaces(
+        self,
+        org: str,
+        includes: list[str],
+        excludes: list[str],
+        selector: str | None = None,
+        stats: ListingStats | None = None,
+        cache: CachePolicy = CachePolicy.USE,
+    ) -> AsyncIterator[WorkspaceRecord]:
+        """Iterate over the workspaces of `org` matching the filters.
+
+        The workspaces must contain all the `includes` tags, none of the
+        `excludes` tags and match the `selector` expression, if any (see
+        `multani.tfcloud.selector`).
+
+        `cache` is how to use the inventory cache, if the client has one.
+        """
+
+        if stats is None:
+            stats = ListingStats()
+
+        self.logger.info("Fetching the list of workspaces")
+
+        select = Selector(selector, includes, excludes)
+        self.logger.debug(f"Selecting workspaces matching: {select}")
+
+        # Let the API filter the workspaces as much as possible: the selector
+        # still applies, in case the API doesn't honor the parameters.
+        params = {
+            "fields[workspaces]": ",".join(WORKSPACE_FIELDS),
+            "fields[runs]": ",".join(RUN_FIELDS),
+            "include": "current_run",
+        }
+        if includes:
+            params["search[tags]"] = ",".join(includes)
+        if excludes:
+            params["search[exclude-tags]"] = ",".join(excludes)
+
+        start = time.perf_counter()
+        pages = self.iter_workspace_pages(org, params, stats=stats, cache=cache)
+        async for page in pages:
+            before = time.perf_counter()
+            workspaces = select.select(page)
+            stats.filter_time += time.perf_counter() - before
+            stats.listed += len(page)
+            stats.selected += len(workspaces)
 
-            response = ListWorkspacesResponse.model_validate_json(r.text)
-            discovered = response.data
             self.logger.debug(
-                f"Fetched {len(discovered)} workspaces, applying filters..."
+                f"Selected {len(workspaces)} workspaces out of {len(page)}"
             )
+            for workspace in workspaces:
+                yield workspace
+
+        stats.elapsed += time.perf_counter() - start
+        self.logger.info(
+            f"Found {stats.selected} matching workspaces out of {stats.listed} workspaces",
+            inventory=stats.inventory,
+            **stats.timings(),
+        )
 
-            workspaces = []
+    async def iter_workspace_refs(
+        self,
+        org: str,
+        includes: list[str],
+        excludes: list[str],
+        selector: str | None = None,
+        priorities: dict[str, int] | None = None,
+        skip_active: bool = True,
+        stats: ListingStats | None = None,
+        cache: CachePolicy = CachePolicy.USE,
+    ) -> AsyncIterator[WorkspaceRef]:
+        """Iterate over the workspaces of `org` to trigger.
+
+        See `fetch_workspaces()` for the filters and `trigger_all()` for the
+        other parameters.
+        """
+
+        if stats is None:
+            stats = ListingStats()
+
+        if skip_active and cache == CachePolicy.USE:
+            # The cached pages may still show runs which completed since, or
+            # not show the runs started since.
+            cache = CachePolicy.REVALIDATE
+
+        workspaces = self.fetch_workspaces(
+            org, includes, excludes, selector, stats, cache
+        )
+        async for ws in workspaces:
+            if skip_active and ws.has_active_run:
+                # Don't queue yet another run behind the current one.
+                self.logger.debug(
+                    f"workspace {ws.name!r} has an active run, skipping",
+                    run_id=ws.current_run_id,
+                    run_status=ws.current_run_status,
+                )
+                stats.skipped_active.append(WorkspaceRef.from_workspace(ws))
+                continue
 
-            for workspace in discovered:
-                name = workspace.attributes.name
-                tags = workspace.attributes.tag_names
+            yield WorkspaceRef.from_workspace(ws, priorities)
 
-                # "remote" means "executed by Terraform Cloud"
-                # https://www.terraform.io/cloud-docs/workspaces/settings#execution-mode
-                if workspace.attributes.execution_mode != "remote":
-                    self.logger.debug(
-                        f"workspace {name!r} doesn't execute remotely, skipping"
-                    )
-                    continue
+        if stats.skipped_active:
+            self.logger.info(
+                f"Skipped {len(stats.skipped_active)} workspaces with an active run"
+            )
 
-                if any(t in tags for t in excludes):
-                    # Workspaces containing this tag were explicitly filtered-out.
-                    excluded = ", ".join(sorted(excludes))
-                    self.logger.debug(
-                        f"workspace {name!r} filtered out by tag: {excluded}"
-                    )
-                    continue
+    async def iter_workspace_pages(
+        self,
+        org: str,
+        params: dict[str, str] | None = None,
+        page_concurrency: int = PAGE_CONCURRENCY,
+        stats: ListingStats | None = None,
+        cache: CachePolicy = CachePolicy.USE,
+    ) -> AsyncIterator[list[WorkspaceRecord]]:
+        """Iterate over all the pages of workspaces of an organization.
+
+        `params` are additional query parameters to filter the workspaces.
+        The time spent fetching and parsing the pages is added to `stats`.
+        `cache` is how to use the inventory cache, if the client has one.
+
+        The first page is fetched alone, to discover how many pages there are.
+        The remaining pages are then fetched concurrently, with at most
+        `page_concurrency` requests in flight, and yielded as soon as they
+        arrive: the pages are *not* yielded in order.
+        """
+
+        with self.tracer.start_span("Terraform Cloud: get workspaces") as span:
+            span.set_attribute("tfcloud.organization_name", org)
+
+            params = params or {}
+            first = await self._fetch_workspaces_page(org, 1, params, stats, cache)
+            total_pages = first.total_pages
+            span.set_attribute("tfcloud.total_pages", total_pages)
+            yield first.workspaces
+
+            pages = iter(range(2, total_pages + 1))
+            pending: set[asyncio.Task[WorkspacePage]] = set()
 
-                if includes:
-                    if set(includes).issubset(set(tags)):
-                        included = ", ".join(sorted(includes))
-                        self.logger.debug(
-                            f"workspace {name!r} selected by tags: {included}"
+            try:
+                while True:
+                    for page in islice(pages, page_concurrency - len(pending)):
+                        coro = self._fetch_workspaces_page(
+                            org, page, params, stats, cache
                         )
-                        workspaces.append(workspace)
-                        continue
+                        pending.add(asyncio.create_task(coro))
 
-                else:
-                    self.logger.debug(f"workspace {name!r} selected")
-                    workspaces.append(workspace)
+                    if not pending:
+                        break
+
+                    done, pending = await asyncio.wait(
+                        pending, return_when=asyncio.FIRST_COMPLETED
+                    )
+                    for task in done:
+                        yield task.result().workspaces
+            finally:
+                for task in pending:
+                    task.cancel()
 
-            self.logger.info(f"Found {len(workspaces)} matching workspaces")
+    async def _fetch_workspaces_page(
+        self,
+        org: str,
+        page: int,
+        params: dict[str, str],
+        stats: ListingStats | None = None,
+        cache: CachePolicy = CachePolicy.USE,
+    ) -> WorkspacePage:
+        if stats is None:
+            stats = ListingStats()
+
+        with self.tracer.start_as_current_span(
+            "Terraform Cloud: get workspaces page"
+        ) as span:
+            span.set_attribute("tfcloud.organization_name", org)
+            span.set_attribute("tfcloud.page", page)
+
+            # https://www.terraform.io/cloud-docs/api-docs/workspaces#list-workspaces
+            url = f"{TF_CLOUD_API}/organizations/{org}/workspaces"
+            params = params | {"page[number]": str(page), "page[size]": str(PAGE_SIZE)}
+
+            inventory = self.inventory if cache != CachePolicy.BYPASS else None
+            cached = None
+            headers = {}
+            if inventory is not None:
+                cached = inventory.get(InventoryCache.key(org, params))
+                if cached is not None:
+                    fresh = cached.age() < inventory.max_age
+                    if fresh and cache == CachePolicy.USE:
+                        self._record_lookup(span, stats, "hit")
+                        return cached.page
+                    if cached.etag is not None:
+                        headers["If-None-Match"] = cached.etag
+
+            start = time.perf_counter()
+            r = await self._request("GET", url, params=params, headers=headers)
+            stats.fetch_time += time.perf_counter() - start
+            stats.pages += 1
+
+            if inventory is not None and cached is not None and r.status_code == 304:
+                self._record_lookup(span, stats, "revalidated")
+                inventory.revalidated(InventoryCache.key(org, params), cached)
+                return cached.page
+
+            check_status_json(r)
+
+            start = time.perf_counter()
+            workspaces = WorkspacePage.parse(r.content)
+            stats.parse_time += time.perf_counter() - start
+
+            if inventory is not None:
+                self._record_lookup(span, stats, "miss")
+                entry = CachedPage(workspaces, r.headers.get("etag"))
+                inventory.put(InventoryCache.key(org, params), entry)
 
             return workspaces
 
-    async def workspace_create_run(
+    def _record_lookup(self, span: Span, stats: ListingStats, result: str) -> None:
+        span.set_attribute("tfcloud.inventory", result)
+        stats.inventory[result] = stats.inventory.get(result, 0) + 1
+
+    async def create_run(
         self,
         org: str,
         ws_name: str,
         ws_id: str,
-    ) -> str | None:
+        on_attempt: Callable[[], None] | None = None,
+    ) -> str:
+        """Start a new run in a workspace, and return the ID of the run.
+
+        `on_attempt` is called before each request sent, retries included.
+        Raises `httpx.HTTPStatusError` if the run couldn't be created.
+        """
+
         logger = self.logger.bind(
             workspace=ws_name, workspace_id=ws_id, organization=org
         )
@@ -142,21 +648,80 @@ class TerraformCloud:
 
             # https://www.terraform.io/cloud-docs/api-docs/run#create-a-run
             url = f"{TF_CLOUD_API}/runs"
-            request = RunCreateRequest.create(ws_id, "Auto-trigger")
+            body = run_create_body(ws_id, "Auto-trigger")
 
-            r = await self.http.post(url, json=request.model_dump())
+            r = await self._request(
+                "POST", url, content=body, on_attempt=on_attempt, idempotent=False
+            )
             try:
                 check_status_json(r)
             except httpx.HTTPStatusError as exc:
                 logger.exception(
                     f"Unable to trigger workspace {ws_name}: {str(exc)}", exception=exc
                 )
-                return None
+                raise
 
-            response = RunCreateResponse.model_validate_json(r.text)
+            response = validate_json(RunCreateResponse, r.content)
 
             run_id = response.data.id
-            link = f"{TF_CLOUD_BASE}/app/{org}/workspaces/{ws_name}/runs/{run_id}"
+            logger.info(f"Run triggered at: {self.run_link(org, ws_name, run_id)}")
+            return run_id
+
+    @staticmethod
+    def run_link(org: str, ws_name: str, run_id: str) -> str:
+        return f"{TF_CLOUD_BASE}/app/{org}/workspaces/{ws_name}/runs/{run_id}"
+
+    async def list_runs(self, org: str, page: int = 1) -> ListRunsResponse:
+        """List a page of the runs of an organization, the most recent first."""
+
+        with self.tracer.start_as_current_span("Terraform Cloud: list runs") as span:
+            span.set_attribute("tfcloud.organization_name", org)
+            span.set_attribute("tfcloud.page", page)
+
+            # https://developer.hashicorp.com/terraform/cloud-docs/api-docs/run#list-runs-in-an-organization
+            url = f"{TF_CLOUD_API}/organizations/{org}/runs"
+            params = {
+                "fields[runs]": "status,created-at,status-timestamps",
+                "page[number]": str(page),
+                "page[size]": str(PAGE_SIZE),
+            }
+            r = await self._request("GET", url, params=params)
+            check_status_json(r)
+
+            return validate_json(ListRunsResponse, r.content)
 
-            logger.info(f"Run triggered at: {link}")
-            return link
+    async def _request(
+        self,
+        method: str,
+        url: str,
+        headers: dict[str, str] | None = None,
+        on_attempt: Callable[[], None] | None = None,
+        idempotent: bool = True,
+        **kwargs: Any,
+    ) -> httpx.Response:
+        """Send a request to the API, within the limits of the rate limiter.
+
+        Throttled requests and transient errors are retried: each attempt goes
+        through the rate limiter again, and calls `on_attempt`, if set.
+
+        A gateway error may be returned after Terraform Cloud handled the
+        request: if the request is not `idempotent`, it's only retried when
+        throttled, unavailable, or when it couldn't be sent.
+        """
+
+        headers = self.headers | (headers or {})
+
+        def send() -> Awaitable[httpx.Response]:
+            if on_attempt is not None:
+                on_attempt()
+            return self.http.request(method, url, headers=headers, **kwargs)
+
+        retry_policy = self.retry_policy
+        if not idempotent:
+            retry_policy = replace(retry_policy, statuses=NON_IDEMPOTENT_STATUSES)
+
+        return await send_with_retry(
+            lambda: self.limiter.request(send),
+            retry_policy,
+            self.retry_budget,
+        )
@@ -0,0 +1,164 @@
+"""Cache the workspace listings of the organizations between invocations
+
+The list of workspaces barely changes between two runs: the pages of
+workspaces returned by the API are kept, parsed as `WorkspacePage`, for each
+organization and filter, in memory and optionally on disk (for instance
+under `/tmp`, which survives between warm invocations of a Cloud Function.)
+
+A cached page is:
+
+* used as is during `max_age` seconds after it was fetched;
+* then revalidated with a conditional request, using the `ETag` the API
+  returned with the page: the API answers `304 Not Modified` without sending
+  the page again if it didn't change;
+* evicted `ttl` seconds after it was last fetched or revalidated.
+
+The pages also contain the status of the current run of each workspace:
+when this status matters (to skip the workspaces with an active run), the
+pages are revalidated on each lookup, whatever their age
+(`CachePolicy.REVALIDATE`).
+"""
+
+import json
+import time
+from dataclasses import dataclass
+from dataclasses import field
+from enum import Enum
+from hashlib import sha256
+from pathlib import Path
+
+import structlog
+
+from .models import WorkspacePage
+
+LOGGER = structlog.get_logger()
+
+# How long a page is used without revalidating it.
+MAX_AGE = 60.0
+# How long a page is kept, revalidated or not.
+TTL = 24 * 3600.0
+
+
+class CachePolicy(Enum):
+    """How to use the cached pages."""
+
+    # Use the pages younger than `max_age` as is, revalidate the others.
+    USE = "use"
+    # Always revalidate the pages: the current runs are up-to-date.
+    REVALIDATE = "revalidate"
+    # Don't read nor write the cache: always fetch the pages.
+    BYPASS = "bypass"
+
+
+@dataclass
+class CachedPage:
+    page: WorkspacePage
+    etag: str | None
+    fetched_at: float = field(default_factory=time.time)
+
+    def age(self, now: float | None = None) -> float:
+        return (now if now is not None else time.time()) - self.fetched_at
+
+
+class InventoryCache:
+    """The pages of workspaces of the organizations, per filter.
+
+    The pages are always kept in memory; they are also written as JSON files
+    in `directory`, if set, to be found again by the next processes.
+    """
+
+    def __init__(
+        self,
+        directory: Path | None = None,
+        max_age: float = MAX_AGE,
+        ttl: float = TTL,
+    ) -> None:
+        self.directory = directory
+        self.max_age = max_age
+        self.ttl = ttl
+
+        self._pages: dict[str, CachedPage] = {}
+        self.logger = LOGGER.bind(kind="inventory")
+
+    @staticmethod
+    def key(org: str, params: dict[str, str]) -> str:
+        """The key of a page, from the organization and the query parameters.
+
+        >>> InventoryCache.key("org", {"page[number]": "1"})[:16]
+        '3ded97eb83eb886a'
+        """
+
+        data = json.dumps([org, sorted(params.items())])
+        return sha256(data.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> CachedPage | None:
+        """The cached page for `key`, if it is not expired."""
+
+        entry = self._pages.get(key)
+        if entry is None and self.directory is not None:
+            entry = self._load(key)
+
+        if entry is None:
+            return None
+
+        if entry.age() > self.ttl:
+            self.evict(key)
+            return None
+
+        return entry
+
+    def put(self, key: str, entry: CachedPage) -> None:
+        self._pages[key] = entry
+
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            data = {
+                "etag": entry.etag,
+                "fetched_at": entry.fetched_at,
+                "page": entry.page.dump(),
+            }
+            path = self._path(key)
+            tmp = path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(data))
+            tmp.replace(path)
+
+        self.expire()
+
+    def revalidated(self, key: str, entry: CachedPage) -> None:
+        """Record that `entry` is still up-to-date."""
+
+        self.put(key, CachedPage(entry.page, entry.etag))
+
+    def evict(self, key: str) -> None:
+        self._pages.pop(key, None)
+        if self.directory is not None:
+            self._path(key).unlink(missing_ok=True)
+
+    def expire(self) -> None:
+        """Evict all the expired pages from memory."""
+
+        now = time.time()
+        for key, entry in list(self._pages.items()):
+            if entry.age(now) > self.ttl:
+                del self._pages[key]
+
+    def _path(self, key: str) -> Path:
+        assert self.directory is not None
+        return self.directory / f"{key}.json"
+
+    def _load(self, key: str) -> CachedPage | None:
+        path = self._path(key)
+        if not path.exists():
+            return None
+
+        try:
+            data = json.loads(path.read_text())
+            page = WorkspacePage.load(data["page"])
+            entry = CachedPage(page, data["etag"], data["fetched_at"])
+        except (ValueError, KeyError, TypeError) as exc:
+            self.logger.warning("Ignoring invalid cached page", path=str(path), exc=exc)
+            path.unlink(missing_ok=True)
+            return None
+
+        self._pages[key] = entry
+        return entry
@@ -1,22 +1,210 @@
+import json
+from dataclasses import astuple
+from dataclasses import dataclass
+from datetime import datetime
+from functools import cache
+from sys import intern
+from typing import Any
 from typing import Self
+from typing import TypeVar
 
 from pydantic import BaseModel
 from pydantic import Field
+from pydantic import TypeAdapter
+from pydantic_core import from_json
 
+T = TypeVar("T")
 
-class WorkspaceAttribute(BaseModel):
+# The statuses of the runs which are done.
+# https://developer.hashicorp.com/terraform/cloud-docs/api-docs/run#run-states
+RUN_FINAL_STATUSES = frozenset(
+    {
+        "applied",
+        "canceled",
+        "discarded",
+        "errored",
+        "force_canceled",
+        "planned_and_finished",
+        "planned_and_saved",
+    }
+)
+# The final statuses of the runs which succeeded.
+RUN_SUCCESS_STATUSES = frozenset(
+    {"applied", "planned_and_finished", "planned_and_saved"}
+)
+
+
+@dataclass(slots=True)
+class WorkspaceRecord:
+    """The attributes of a workspace needed to select and trigger it.
+
+    This is a compact version of the workspaces of the API, to keep the
+    workspaces of large organizations in memory: the tags and the other
+    repeated strings are interned, so each distinct tag is only stored once.
+    """
+
+    id: str
+    name: str
+    tag_names: tuple[str, ...]
+    execution_mode: str
+    current_run_id: str | None = None
+    current_run_status: str | None = None
+
+    @property
+    def has_active_run(self) -> bool:
+        """Is the current run of the workspace still in progress?"""
+
+        status = self.current_run_status
+        return status is not None and status not in RUN_FINAL_STATUSES
+
+
+@dataclass(slots=True)
+class WorkspacePage:
+    """A page of workspaces, as returned by the list workspaces API."""
+
+    workspaces: list[WorkspaceRecord]
+    total_pages: int = 1
+
+    @classmethod
+    def parse(cls, content: bytes | str) -> Self:
+        """Parse a page of the list workspaces API.
+
+        Only the attributes of `WorkspaceRecord` are kept: the rest of the
+        document is dropped as soon as the page is parsed.
+
+        >>> page = WorkspacePage.parse(
+        ...     b'{"data": [{"id": "ws-1", "attributes": {"name": "one", '
+        ...     b'"tag-names": ["prod"], "execution-mode": "remote"}}]}'
+        ... )
+        >>> page.workspaces[0].tag_names
+        ('prod',)
+        """
+
+        document = from_json(content)
+
+        statuses = {
+            resource["id"]: resource.get("attributes", {}).get("status")
+            for resource in document.get("included") or ()
+            if resource.get("type") == "runs"
+        }
+
+        workspaces = []
+        for workspace in document["data"]:
+            attributes = workspace["attributes"]
+
+            relationships = workspace.get("relationships") or {}
+            run = (relationships.get("current-run") or {}).get("data")
+            run_id = run["id"] if run else None
+            status = statuses.get(run_id) if run_id else None
+
+            workspaces.append(
+                WorkspaceRecord(
+                    workspace["id"],
+                    attributes["name"],
+                    tuple(intern(tag) for tag in attributes.get("tag-names") or ()),
+                    intern(attributes["execution-mode"]),
+                    run_id,
+                    intern(status) if status else None,
+                )
+            )
+
+        pagination = (document.get("meta") or {}).get("pagination") or {}
+        return cls(workspaces, pagination.get("total-pages", 1))
+
+    def dump(self) -> dict[str, Any]:
+        """The page as JSON-compatible data, see `load()`."""
+
+        return {
+            "total_pages": self.total_pages,
+            "workspaces": [astuple(workspace) for workspace in self.workspaces],
+        }
+
+    @classmethod
+    def load(cls, data: dict[str, Any]) -> Self:
+        """Load a page dumped by `dump()`."""
+
+        workspaces = [
+            WorkspaceRecord(
+                id,
+                name,
+                tuple(intern(tag) for tag in tags),
+                intern(mode),
+                run_id,
+                intern(status) if status else None,
+            )
+            for id, name, tags, mode, run_id, status in data["workspaces"]
+        ]
+        return cls(workspaces, data["total_pages"])
+
+
+class WorkspaceRef(BaseModel):
+    """The minimal information needed to trigger a workspace."""
+
+    id: str
     name: str
-    tag_names: list[str] = Field(alias="tag-names")
-    execution_mode: str = Field(alias="execution-mode")
+    priority: int = 0
+
+    @classmethod
+    def from_workspace(
+        cls, workspace: WorkspaceRecord, priorities: dict[str, int] | None = None
+    ) -> Self:
+        """Reference a workspace, with the highest priority of its tags."""
+
+        priority = 0
+        if priorities:
+            tags = workspace.tag_names
+            priority = max((priorities[t] for t in tags if t in priorities), default=0)
+
+        return cls(id=workspace.id, name=workspace.name, priority=priority)
+
+
+class Pagination(BaseModel):
+    current_page: int = Field(alias="current-page")
+    total_pages: int = Field(alias="total-pages")
+    total_count: int = Field(alias="total-count")
+
+
+class ListMeta(BaseModel):
+    pagination: Pagination | None = None
 
 
-class Workspace(BaseModel):
+class RunAttributes(BaseModel):
+    status: str
+    created_at: datetime = Field(alias="created-at")
+    status_timestamps: dict[str, datetime] = Field(
+        default={}, alias="status-timestamps"
+    )
+
+
+class Run(BaseModel):
     id: str
-    attributes: WorkspaceAttribute
+    attributes: RunAttributes
+
+    @property
+    def done(self) -> bool:
+        return self.attributes.status in RUN_FINAL_STATUSES
+
+    @property
+    def finished_at(self) -> datetime | None:
+        """When the run reached its current, final, status."""
+
+        if not self.done:
+            return None
+
+        # For instance: "planned_and_finished" -> "planned-and-finished-at"
+        key = f"{self.attributes.status.replace('_', '-')}-at"
+        return self.attributes.status_timestamps.get(key)
+
 
+class ListRunsResponse(BaseModel):
+    data: list[Run]
+    meta: ListMeta | None = None
 
-class ListWorkspacesResponse(BaseModel):
-    data: list[Workspace]
+    @property
+    def total_pages(self) -> int:
+        if self.meta is None or self.meta.pagination is None:
+            return 1
+        return self.meta.pagination.total_pages
 
 
 class RunCreateAttribute(BaseModel):
@@ -67,3 +255,46 @@ class RunCreateResponseData(BaseModel):
 
 class RunCreateResponse(BaseModel):
     data: RunCreateResponseData
+
+
+# The type adapters, built once per type: building them compiles a validator.
+_ADAPTERS: dict[type, TypeAdapter[Any]] = {}
+
+# The placeholder of the workspace ID in the run creation body templates.
+_WORKSPACE_ID = "__workspace_id__"
+
+
+def validate_json(model: type[T], data: bytes | str) -> T:
+    """Validate a JSON document, straight from the bytes of a response.
+
+    >>> validate_json(RunCreateResponse, b'{"data": {"id": "run-1"}}').data.id
+    'run-1'
+    """
+
+    adapter = _ADAPTERS.get(model)
+    if adapter is None:
+        adapter = _ADAPTERS[model] = TypeAdapter(model)
+
+    value: T = adapter.validate_json(data)
+    return value
+
+
+@cache
+def _run_create_template(message: str) -> tuple[bytes, bytes]:
+    body = RunCreateRequest.create(_WORKSPACE_ID, message).model_dump_json()
+    prefix, suffix = body.encode("utf-8").split(json.dumps(_WORKSPACE_ID).encode())
+    return prefix, suffix
+
+
+def run_create_body(workspace_id: str, message: str) -> bytes:
+    """The JSON body of `RunCreateRequest.create(workspace_id, message)`.
+
+    The body is built once per message, and only the workspace ID changes.
+
+    >>> body = run_create_body("ws-1", "Auto-trigger")
+    >>> body == RunCreateRequest.create("ws-1", "Auto-trigger").model_dump_json().encode()
+    True
+    """
+
+    prefix, suffix = _run_create_template(message)
+    return prefix + json.dumps(workspace_id).encode("utf-8") + suffix
@@ -0,0 +1,268 @@
+"""What happened to the workspaces during a trigger-all operation
+
+The `TriggerReport` counts the workspaces by outcome: whether a run was
+created, how many requests it took, how long the workspace waited in the
+queue before a worker picked it up, and how long the API took to create the
+run. The aggregates are emitted as a single log record and as span
+attributes, to follow the fan-out performance over time.
+
+The memory used by the report doesn't depend on the size of the
+organization: the percentiles of the durations are estimated from a sample,
+and only the failed workspaces, the slowest ones, and the workspaces to hand
+over to the next invocation are kept in full.
+"""
+
+import random
+from bisect import insort
+from collections import Counter
+from dataclasses import dataclass
+from dataclasses import field
+from enum import StrEnum
+from math import ceil
+from typing import Iterable
+from typing import Sequence
+from typing import TypeVar
+
+from opentelemetry.trace import Span
+from opentelemetry.util.types import AttributeValue
+from structlog.typing import FilteringBoundLogger
+
+from .models import WorkspaceRef
+from .runs import RunSummary
+
+T = TypeVar("T")
+
+# The percentiles of the durations to report.
+PERCENTILES = (50, 95, 99)
+# How many durations to keep to estimate the percentiles.
+SAMPLE_SIZE = 1000
+# How many of the slowest workspaces to report.
+SLOWEST = 10
+# How many workspaces of each status to name in the log record, and how many
+# characters of each error: Cloud Logging drops the entries over 256 KB.
+MAX_NAMES = 100
+MAX_ERROR_LENGTH = 200
+
+
+class WorkspaceStatus(StrEnum):
+    # A run was created.
+    TRIGGERED = "triggered"
+    # The run couldn't be created.
+    FAILED = "failed"
+    # The workspace had a run in progress already.
+    SKIPPED_ACTIVE = "skipped_active"
+    # A run was created by a previous delivery of the same request.
+    CHECKPOINTED = "checkpointed"
+    # The deadline was too close to create the run.
+    DEFERRED = "deferred"
+
+
+@dataclass(slots=True)
+class WorkspaceResult:
+    workspace: WorkspaceRef
+    status: WorkspaceStatus
+    run_id: str | None = None
+    error: str | None = None
+    # How many requests were sent to create the run, including the retries.
+    attempts: int = 0
+    # How long the workspace waited in the queue, in seconds.
+    queue_wait: float = 0.0
+    # How long creating the run took, retries included, in seconds.
+    latency: float = 0.0
+
+    def attempt(self) -> None:
+        self.attempts += 1
+
+
+class Sample:
+    """A uniform sample of at most `size` values ("reservoir sampling").
+
+    The percentiles of the sample estimate the percentiles of all the values
+    added, in constant memory: they are exact until `size` values are added.
+
+    >>> sample = Sample(size=3)
+    >>> for value in [0.4, 0.1, 0.3]:
+    ...     sample.add(value)
+    >>> sample.percentile(50)
+    0.3
+    """
+
+    def __init__(self, size: int = SAMPLE_SIZE, seed: int = 0) -> None:
+        self.size = size
+        self.values: list[float] = []
+        self.count = 0
+        self._random = random.Random(seed)
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        if len(self.values) < self.size:
+            self.values.append(value)
+            return
+
+        # Each value added so far has the same chance to be in the sample.
+        index = self._random.randrange(self.count)
+        if index < self.size:
+            self.values[index] = value
+
+    def percentile(self, q: float) -> float:
+        return percentile(self.values, q)
+
+
+@dataclass
+class TriggerReport:
+    organization: str
+    # Were all the workspaces of the organization listed?
+    listed_all: bool = True
+    # How many workspaces were listed, and how many matched the filters.
+    listed: int = 0
+    selected: int = 0
+    # The outcome of the runs, if they were tracked.
+    runs: RunSummary | None = None
+
+    # How many workspaces ended with each status.
+    totals: Counter[WorkspaceStatus] = field(default_factory=Counter)
+    # How many requests were sent to create the runs, retries included, and
+    # how many runs needed more than one.
+    attempts: int = 0
+    retried: int = 0
+    # A sample of the durations of the run creations.
+    queue_wait: Sample = field(default_factory=Sample)
+    latency: Sample = field(default_factory=Sample)
+
+    # The workspaces where the run couldn't be created.
+    failed: list[WorkspaceResult] = field(default_factory=list)
+    # The `SLOWEST` run creations, the slowest last.
+    slowest: list[WorkspaceResult] = field(default_factory=list)
+    # The workspaces to hand over, as the deadline was too close.
+    deferred: list[WorkspaceRef] = field(default_factory=list)
+    # The first `MAX_NAMES` workspaces skipped because of an active run.
+    skipped_active: list[WorkspaceRef] = field(default_factory=list)
+
+    def add(self, result: WorkspaceResult) -> None:
+        """Count the outcome of a workspace, once it's final."""
+
+        self.totals[result.status] += 1
+
+        if result.status == WorkspaceStatus.DEFERRED:
+            self.deferred.append(result.workspace)
+        elif result.status == WorkspaceStatus.SKIPPED_ACTIVE:
+            if len(self.skipped_active) < MAX_NAMES:
+                self.skipped_active.append(result.workspace)
+        elif result.status in (WorkspaceStatus.TRIGGERED, WorkspaceStatus.FAILED):
+            self.attempts += result.attempts
+            self.retried += result.attempts > 1
+            self.queue_wait.add(result.queue_wait)
+            self.latency.add(result.latency)
+
+            if result.status == WorkspaceStatus.FAILED:
+                self.failed.append(result)
+            if result.latency:
+                insort(self.slowest, result, key=lambda result: result.latency)
+                del self.slowest[:-SLOWEST]
+
+    @property
+    def succeeded(self) -> bool:
+        """Were all the runs created, and did they succeed (if tracked)?"""
+
+        if self.failed:
+            return False
+        return self.runs is None or self.runs.succeeded
+
+    def counts(self) -> dict[str, int]:
+        return {status.value: self.totals[status] for status in WorkspaceStatus}
+
+    def attributes(self) -> dict[str, AttributeValue]:
+        """The aggregates of the report, as span attributes."""
+
+        attributes: dict[str, AttributeValue] = {
+            "tfcloud.organization_name": self.organization,
+            "tfcloud.listed_all": self.listed_all,
+            "tfcloud.listed": self.listed,
+            "tfcloud.selected": self.selected,
+            "tfcloud.attempts": self.attempts,
+            "tfcloud.retried": self.retried,
+        }
+        for status, total in self.counts().items():
+            attributes[f"tfcloud.workspaces.{status}"] = total
+
+        for name, sample in (
+            ("queue_wait", self.queue_wait),
+            ("latency", self.latency),
+        ):
+            for q in PERCENTILES:
+                attributes[f"tfcloud.{name}.p{q}"] = sample.percentile(q)
+
+        if self.runs is not None:
+            for status, total in self.runs.counts().items():
+                attributes[f"tfcloud.runs.{status}"] = total
+
+        return attributes
+
+    def emit(self, logger: FilteringBoundLogger, span: Span) -> None:
+        """Emit the report as span attributes, and as a single log record.
+
+        The log record names at most `MAX_NAMES` workspaces per status, and
+        counts the others in `omitted`.
+        """
+
+        attributes = self.attributes()
+        span.set_attributes(attributes)
+
+        omitted: dict[str, int] = {}
+
+        def listed(status: WorkspaceStatus, items: Sequence[T]) -> list[T]:
+            kept, _ = cap(items)
+            omitted[status] = self.totals[status] - len(kept)
+            return kept
+
+        failed = listed(WorkspaceStatus.FAILED, self.failed)
+        skipped_active = listed(WorkspaceStatus.SKIPPED_ACTIVE, self.skipped_active)
+        deferred = listed(WorkspaceStatus.DEFERRED, self.deferred)
+
+        logger.info(
+            "Trigger report",
+            **attributes,
+            failed={
+                result.workspace.name: (result.error or "")[:MAX_ERROR_LENGTH]
+                for result in failed
+            },
+            skipped_active=names(skipped_active),
+            deferred=names(deferred),
+            omitted={status: total for status, total in omitted.items() if total},
+            slowest={
+                result.workspace.name: round(result.latency, 3)
+                for result in reversed(self.slowest)
+            },
+        )
+
+
+def cap(items: Sequence[T], limit: int = MAX_NAMES) -> tuple[list[T], int]:
+    """The first `limit` items, and how many items were left out.
+
+    >>> cap(["a", "b", "c"], 2)
+    (['a', 'b'], 1)
+    """
+
+    return list(items[:limit]), max(0, len(items) - limit)
+
+
+def names(workspaces: Iterable[WorkspaceRef]) -> list[str]:
+    return [ws.name for ws in workspaces]
+
+
+def percentile(values: list[float], q: float) -> float:
+    """The `q`-th percentile of `values`, with the nearest-rank method.
+
+    >>> percentile([0.4, 0.1, 0.3, 0.2], 50)
+    0.2
+    >>> percentile([0.4, 0.1, 0.3, 0.2], 99)
+    0.4
+    >>> percentile([], 50)
+    0.0
+    """
+
+    if not values:
+        return 0.0
+
+    ordered = sorted(values)
+    return ordered[max(0, ceil(q / 100 * len(ordered)) - 1)]
@@ -0,0 +1,230 @@
+"""Track the runs created in Terraform Cloud until they complete
+
+Instead of getting each run on each poll, the `RunTracker` lists the most
+recent runs of the organization, 100 runs per request, until it has seen all
+the runs it still waits for: the cost of a poll depends on how many runs were
+created since the runs started, not on how many runs are tracked.
+
+The interval between two polls adapts to the progress of the runs, and to
+the number of requests each poll needed, so that the tracker sends at most
+`requests_per_minute` requests on average.
+"""
+
+import asyncio
+from dataclasses import dataclass
+from dataclasses import field
+from datetime import UTC
+from datetime import datetime
+from datetime import timedelta
+from typing import TYPE_CHECKING
+
+import structlog
+
+from ..deadline import Deadline
+from ..tracing import get_tracer
+from .models import RUN_SUCCESS_STATUSES
+from .models import Run
+from .models import WorkspaceRef
+
+if TYPE_CHECKING:
+    from .client import TerraformCloud
+
+LOGGER = structlog.get_logger()
+
+# The bounds of the interval between two polls, in seconds.
+MIN_INTERVAL = 10.0
+MAX_INTERVAL = 120.0
+# How much the interval grows when no run completed since the previous poll.
+INTERVAL_GROWTH = 1.5
+# The average number of requests per minute the tracker may send.
+REQUESTS_PER_MINUTE = 6
+# How long to wait for the runs, at most.
+TIMEOUT = 3600.0
+# The difference tolerated between the clocks of Terraform Cloud and ours.
+CLOCK_SKEW = timedelta(minutes=5)
+
+
+@dataclass
+class RunOutcome:
+    """What happened to a run created in a workspace."""
+
+    workspace: WorkspaceRef
+    run_id: str
+    created_at: datetime = field(default_factory=lambda: datetime.now(UTC))
+    status: str | None = None
+    finished_at: datetime | None = None
+    done: bool = False
+
+    @property
+    def succeeded(self) -> bool:
+        return self.status in RUN_SUCCESS_STATUSES
+
+    @property
+    def duration(self) -> float | None:
+        """How many seconds the run took, if it is done."""
+
+        if self.finished_at is None:
+            return None
+        return (self.finished_at - self.created_at).total_seconds()
+
+    def update(self, run: Run) -> None:
+        self.status = run.attributes.status
+        self.created_at = run.attributes.created_at
+        self.done = run.done
+        if run.done:
+            self.finished_at = run.finished_at or datetime.now(UTC)
+
+
+@dataclass
+class RunSummary:
+    """The outcomes of all the tracked runs."""
+
+    outcomes: list[RunOutcome]
+
+    @property
+    def succeeded(self) -> bool:
+        return all(outcome.succeeded for outcome in self.outcomes)
+
+    def counts(self) -> dict[str, int]:
+        """How many runs per status; "pending" for the runs not done."""
+
+        counts: dict[str, int] = {}
+        for outcome in self.outcomes:
+            status = outcome.status if outcome.done else "pending"
+            assert status is not None
+            counts[status] = counts.get(status, 0) + 1
+        return counts
+
+
+class RunTracker:
+    """Wait for the runs of an organization to reach a final status."""
+
+    def __init__(
+        self,
+        tfcloud: "TerraformCloud",
+        org: str,
+        min_interval: float = MIN_INTERVAL,
+        max_interval: float = MAX_INTERVAL,
+        requests_per_minute: float = REQUESTS_PER_MINUTE,
+        timeout: float = TIMEOUT,
+    ) -> None:
+        self.tfcloud = tfcloud
+        self.org = org
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.requests_per_minute = requests_per_minute
+        self.timeout = timeout
+
+        self.outcomes: dict[str, RunOutcome] = {}
+        self.polls = 0
+        self.requests = 0
+
+        self.logger = LOGGER.bind(kind="run-tracker", organization=org)
+        self.tracer = get_tracer(__name__)
+
+    def add(self, workspace: WorkspaceRef, run_id: str) -> None:
+        """Track a run just created in `workspace`."""
+
+        self.outcomes[run_id] = RunOutcome(workspace, run_id)
+
+    def pending(self) -> list[RunOutcome]:
+        return [outcome for outcome in self.outcomes.values() if not outcome.done]
+
+    def summary(self) -> RunSummary:
+        return RunSummary(list(self.outcomes.values()))
+
+    async def poll(self) -> int:
+        """Update the status of the pending runs, return how many completed."""
+
+        pending = {outcome.run_id: outcome for outcome in self.pending()}
+        if not pending:
+            return 0
+
+        # The runs are listed from the most recent: stop once the listing
+        # reaches the runs created before all the pending ones.
+        oldest = min(outcome.created_at for outcome in pending.values()) - CLOCK_SKEW
+        unseen = set(pending)
+        completed = 0
+        page = 1
+
+        self.polls += 1
+        while unseen:
+            response = await self.tfcloud.list_runs(self.org, page)
+            self.requests += 1
+
+            for run in response.data:
+                outcome = pending.get(run.id)
+                if outcome is None:
+                    continue
+
+                unseen.discard(run.id)
+                outcome.update(run)
+                if outcome.done:
+                    completed += 1
+                    self.logger.info(
+                        f"Run of {outcome.workspace.name!r} finished: {outcome.status}",
+                        run_id=run.id,
+                        duration=outcome.duration,
+                    )
+
+            if (
+                not response.data
+                or page >= response.total_pages
+                or response.data[-1].attributes.created_at < oldest
+            ):
+                break
+
+            page += 1
+
+        return completed
+
+    async def wait(self, deadline: Deadline | None = None) -> RunSummary:
+        """Poll the runs until they are all done, or until `deadline`.
+
+        The tracker doesn't wait more than its `timeout` in any case: runs
+        waiting for a confirmation may never complete.
+        """
+
+        timeout = Deadline.after(self.timeout)
+        if deadline is None or timeout.at < deadline.at:
+            deadline = timeout
+
+        with self.tracer.start_as_current_span("Terraform Cloud: wait runs") as span:
+            span.set_attribute("tfcloud.organization_name", self.org)
+            span.set_attribute("tfcloud.runs", len(self.outcomes))
+
+            interval = self.min_interval
+            while self.pending():
+                if deadline.expired(interval):
+                    self.logger.warning(
+                        f"Deadline reached, {len(self.pending())} runs not done"
+                    )
+                    break
+
+                await asyncio.sleep(interval)
+
+                requests = self.requests
+                completed = await self.poll()
+                requests = self.requests - requests
+
+                # Poll more often while the runs progress, less often when
+                # they don't, and never faster than the requests allow.
+                if completed:
+                    interval = self.min_interval
+                else:
+                    interval = min(self.max_interval, interval * INTERVAL_GROWTH)
+                interval = max(interval, requests * 60 / self.requests_per_minute)
+
+            summary = self.summary()
+            span.set_attribute("tfcloud.polls", self.polls)
+            span.set_attribute("tfcloud.poll_requests", self.requests)
+            for status, total in summary.counts().items():
+                span.set_attribute(f"tfcloud.runs.{status}", total)
+
+            self.logger.info(
+                "Runs finished",
+                counts=summary.counts(),
+                polls=self.polls,
+                requests=self.requests,
+            )
+            return summary
@@ -0,0 +1,250 @@
+"""Select workspaces with boolean expressions
+
+A selector is a boolean expression over the workspaces attributes:
+
+* `tag:<tag>` (or simply `<tag>`) matches the workspaces having this tag;
+* `name:<glob>` matches the workspace names, with shell-style wildcards;
+* `mode:<execution-mode>` matches the workspace execution mode;
+
+combined with `and`, `or`, `not` and parenthesis. For example::
+
+    (tag:prod or name:prod-*) and not tag:ignore
+
+Unless the expression checks the execution mode, only the workspaces executed
+remotely (by Terraform Cloud) are selected.
+
+The expression is compiled once into nested functions, where each tag used
+in the expression is a bit: the tags of each workspace are converted into a
+bitset, and the tag predicates are only bitwise operations.
+
+>>> selector = Selector("(tag:prod or name:prod-*) and not tag:ignore")
+>>> str(selector)
+'(((tag:prod or name:prod-*) and not tag:ignore) and mode:remote)'
+>>> selector.matches("prod-network", ["network"], "remote")
+True
+>>> selector.matches("prod-network", ["ignore"], "remote")
+False
+"""
+
+import re
+from fnmatch import translate
+from typing import Any
+from typing import Callable
+from typing import Iterable
+
+from .models import WorkspaceRecord
+
+# An expression node: ("and", left, right), ("or", left, right),
+# ("not", node) or (predicate, value) where predicate is "tag", "name" or
+# "mode".
+Node = tuple[Any, ...]
+# A compiled expression: called with the tags bitset, the name and the
+# execution mode of a workspace.
+Match = Callable[[int, str, str], bool]
+
+PREDICATES = ("tag", "name", "mode")
+_TOKENS = re.compile(r"\s*(\(|\)|[^\s()]+)")
+
+
+class SelectorError(ValueError):
+    pass
+
+
+class Selector:
+    """A compiled workspace selector.
+
+    The workspaces are selected if they match the `expression`, contain all
+    the `includes` tags and none of the `excludes` tags.
+    """
+
+    def __init__(
+        self,
+        expression: str | None = None,
+        includes: Iterable[str] = (),
+        excludes: Iterable[str] = (),
+    ) -> None:
+        nodes: list[Node] = [("tag", tag) for tag in includes]
+
+        excluded: list[Node] = [("tag", tag) for tag in excludes]
+        if excluded:
+            nodes.append(("not", _join("or", excluded)))
+
+        if expression:
+            nodes.append(parse(expression))
+
+        if not any(_uses(node, "mode") for node in nodes):
+            # "remote" means "executed by Terraform Cloud"
+            # https://www.terraform.io/cloud-docs/workspaces/settings#execution-mode
+            nodes.append(("mode", "remote"))
+
+        self.tree = _join("and", nodes)
+
+        # Each tag used in the expression is a bit of the tags bitset.
+        self.tags: dict[str, int] = {}
+        self._match = self._compile(self.tree)
+
+    def __str__(self) -> str:
+        return _format(self.tree)
+
+    def matches(self, name: str, tags: Iterable[str], execution_mode: str) -> bool:
+        """Does the selector match a workspace with these attributes?"""
+
+        return self._match(self.bitset(tags), name, execution_mode)
+
+    def bitset(self, tags: Iterable[str]) -> int:
+        bits = self.tags
+        mask = 0
+        for tag in tags:
+            mask |= bits.get(tag, 0)
+        return mask
+
+    def select(self, workspaces: Iterable[WorkspaceRecord]) -> list[WorkspaceRecord]:
+        """Select the matching workspaces of a batch of workspaces."""
+
+        bits = self.tags
+        match = self._match
+        selected = []
+
+        for workspace in workspaces:
+            mask = 0
+            for tag in workspace.tag_names:
+                mask |= bits.get(tag, 0)
+
+            if match(mask, workspace.name, workspace.execution_mode):
+                selected.append(workspace)
+
+        return selected
+
+    def _compile(self, tree: Node) -> Match:
+        # The expression is compiled into nested closures, never into source
+        # code: the values of the expression can't be evaluated.
+        kind = tree[0]
+
+        if kind == "and":
+            left, right = self._compile(tree[1]), self._compile(tree[2])
+
+            def match(tags: int, name: str, mode: str) -> bool:
+                return left(tags, name, mode) and right(tags, name, mode)
+
+        elif kind == "or":
+            left, right = self._compile(tree[1]), self._compile(tree[2])
+
+            def match(tags: int, name: str, mode: str) -> bool:
+                return left(tags, name, mode) or right(tags, name, mode)
+
+        elif kind == "not":
+            operand = self._compile(tree[1])
+
+            def match(tags: int, name: str, mode: str) -> bool:
+                return not operand(tags, name, mode)
+
+        elif kind == "tag":
+            bit = self.tags.setdefault(tree[1], 1 << len(self.tags))
+
+            def match(tags: int, name: str, mode: str) -> bool:
+                return bool(tags & bit)
+
+        elif kind == "name":
+            glob = re.compile(translate(tree[1])).match
+
+            def match(tags: int, name: str, mode: str) -> bool:
+                return glob(name) is not None
+
+        else:
+            value: str = tree[1]
+
+            def match(tags: int, name: str, mode: str) -> bool:
+                return mode == value
+
+        return match
+
+
+def parse(expression: str) -> Node:
+    """Parse a selector expression.
+
+    >>> parse("not tag:a or b")
+    ('or', ('not', ('tag', 'a')), ('tag', 'b'))
+    """
+
+    tokens = _TOKENS.findall(expression)
+    position = 0
+
+    def peek() -> str | None:
+        return tokens[position] if position < len(tokens) else None
+
+    def take() -> str:
+        nonlocal position
+        token = peek()
+        if token is None:
+            raise SelectorError(f"Unexpected end of selector: {expression!r}")
+        position += 1
+        return token
+
+    def parse_or() -> Node:
+        node = parse_and()
+        while peek() == "or":
+            take()
+            node = ("or", node, parse_and())
+        return node
+
+    def parse_and() -> Node:
+        node = parse_not()
+        while peek() == "and":
+            take()
+            node = ("and", node, parse_not())
+        return node
+
+    def parse_not() -> Node:
+        token = take()
+
+        if token == "not":
+            return ("not", parse_not())
+
+        if token == "(":
+            node = parse_or()
+            if take() != ")":
+                raise SelectorError(f"Missing closing parenthesis: {expression!r}")
+            return node
+
+        if token in (")", "and", "or"):
+            raise SelectorError(f"Unexpected {token!r} in selector: {expression!r}")
+
+        kind, sep, value = token.partition(":")
+        if not sep:
+            return ("tag", token)
+
+        if kind not in PREDICATES or not value:
+            raise SelectorError(f"Invalid predicate {token!r}: {expression!r}")
+
+        return (kind, value)
+
+    node = parse_or()
+    if peek() is not None:
+        raise SelectorError(f"Unexpected {peek()!r} in selector: {expression!r}")
+
+    return node
+
+
+def _join(operator: str, nodes: list[Node]) -> Node:
+    node = nodes[0]
+    for other in nodes[1:]:
+        node = (operator, node, other)
+    return node
+
+
+def _uses(node: Node, predicate: str) -> bool:
+    if node[0] in ("and", "or"):
+        return _uses(node[1], predicate) or _uses(node[2], predicate)
+    elif node[0] == "not":
+        return _uses(node[1], predicate)
+    else:
+        return bool(node[0] == predicate)
+
+
+def _format(node: Node) -> str:
+    if node[0] in ("and", "or"):
+        return f"({_format(node[1])} {node[0]} {_format(node[2])})"
+    elif node[0] == "not":
+        return f"not {_format(node[1])}"
+    else:
+        return f"{node[0]}:{node[1]}"
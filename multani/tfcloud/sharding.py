@@ -0,0 +1,36 @@
+"""Partition the workspaces of an organization into shards
+
+Each workspace is assigned to a shard from a hash of its ID: the assignment
+doesn't depend on the order in which the workspaces are listed, nor on the
+Python process (unlike `hash()`), so a workspace always lands in the same
+shard for a given number of shards.
+
+>>> shard_of("ws-abc", 4) == shard_of("ws-abc", 4)
+True
+>>> 0 <= shard_of("ws-abc", 4) < 4
+True
+"""
+
+from hashlib import blake2b
+from typing import Iterable
+
+from .models import WorkspaceRef
+
+
+def shard_of(workspace_id: str, shards: int) -> int:
+    """The shard, between 0 and `shards - 1`, of a workspace."""
+
+    digest = blake2b(workspace_id.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % shards
+
+
+def partition(
+    workspaces: Iterable[WorkspaceRef], shards: int
+) -> list[list[WorkspaceRef]]:
+    """Split the workspaces into `shards` lists, some of them may be empty."""
+
+    partitions: list[list[WorkspaceRef]] = [[] for _ in range(shards)]
+    for ws in workspaces:
+        partitions[shard_of(ws.id, shards)].append(ws)
+
+    return partitions
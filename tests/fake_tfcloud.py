@@ -0,0 +1,321 @@
+"""A local stand-in for the Terraform Cloud API
+
+`FakeTerraformCloud` serves the parts of the API used by `TerraformCloud`
+from memory, as an httpx transport, for the tests and the benchmarks:
+
+* the workspaces of an organization, paginated, filtered by tags, with the
+  status of their current run, and with an `ETag` to revalidate the pages;
+* the creation of runs, which then go through a configurable list of
+  statuses, one status each time the runs are listed;
+* the list of the runs of an organization, the most recent first.
+
+It also simulates how the API misbehaves: latency, bursts of throttled
+requests (HTTP 429) and server errors (HTTP 503).
+
+>>> fake = FakeTerraformCloud(make_workspaces(250))
+>>> request = httpx.Request("GET", f"{TF_CLOUD_API}/organizations/org/workspaces")
+>>> asyncio.run(fake.handle(request)).json()["meta"]["pagination"]["total-pages"]
+13
+"""
+
+import asyncio
+import json
+import random
+import re
+from collections import Counter
+from dataclasses import dataclass
+from dataclasses import field
+from datetime import UTC
+from datetime import datetime
+from hashlib import blake2b
+from itertools import count
+from typing import Any
+from typing import Callable
+
+import httpx
+
+from multani.tfcloud.client import TF_CLOUD_API
+
+# A latency, in seconds, or a function returning a random latency.
+Latency = float | Callable[[random.Random], float]
+
+# The statuses a new run goes through, by default.
+RUN_LIFECYCLE = ("pending", "planning", "planned_and_finished")
+# The default page size of the API.
+DEFAULT_PAGE_SIZE = 20
+
+_API_PATH = httpx.URL(TF_CLOUD_API).path
+_WORKSPACES = re.compile(rf"{_API_PATH}/organizations/([^/]+)/workspaces")
+_RUNS = re.compile(rf"{_API_PATH}/organizations/([^/]+)/runs")
+_CREATE_RUN = f"{_API_PATH}/runs"
+
+
+def lognormal(median: float, sigma: float = 0.5) -> Latency:
+    """A log-normal latency distribution, with a long tail."""
+
+    def latency(rng: random.Random) -> float:
+        return rng.lognormvariate(0, sigma) * median
+
+    return latency
+
+
+@dataclass
+class FakeWorkspace:
+    id: str
+    name: str
+    tags: list[str] = field(default_factory=list)
+    execution_mode: str = "remote"
+    # The status of the current run of the workspace, if it has one.
+    run_status: str | None = None
+    # The statuses the runs created in this workspace go through.
+    run_lifecycle: tuple[str, ...] | None = None
+
+
+def make_workspace(
+    index: int, tags: list[str] | None = None, run_status: str | None = None
+) -> FakeWorkspace:
+    return FakeWorkspace(
+        f"ws-{index}", f"workspace-{index}", tags or [], "remote", run_status
+    )
+
+
+def make_workspaces(total: int) -> list[FakeWorkspace]:
+    """Workspaces spread over 10 teams, 1 in 50 of them tagged "ignore"."""
+
+    workspaces = []
+    for i in range(total):
+        tags = [f"team-{i % 10}", "prod" if i % 3 else "dev"]
+        if i % 50 == 0:
+            tags.append("ignore")
+        workspaces.append(make_workspace(i, tags))
+    return workspaces
+
+
+@dataclass
+class FakeRun:
+    id: str
+    workspace_id: str
+    lifecycle: tuple[str, ...]
+    created_at: datetime = field(default_factory=lambda: datetime.now(UTC))
+    # How many times the run was listed: the run moves to its next status each
+    # time, after the first one.
+    polls: int = 0
+
+    @property
+    def status(self) -> str:
+        return self.lifecycle[min(max(self.polls - 1, 0), len(self.lifecycle) - 1)]
+
+    def resource(self) -> dict[str, Any]:
+        now = datetime.now(UTC).isoformat()
+        attributes = {
+            "status": self.status,
+            "created-at": self.created_at.isoformat(),
+            "status-timestamps": {f"{self.status.replace('_', '-')}-at": now},
+        }
+        return {"id": self.id, "type": "runs", "attributes": attributes}
+
+
+class FakeTerraformCloud:
+    """An in-memory Terraform Cloud API, for a single organization.
+
+    * `latency` delays each response;
+    * `throttle_every` and `throttle_burst` throttle the last
+      `throttle_burst` requests of every `throttle_every` requests, asking
+      the client to wait `throttle_reset` seconds;
+    * `error_rate` is the probability of each request to fail with a 503.
+
+    The random values are drawn from a generator seeded with `seed`. The
+    requests received are kept in `requests`, unless `record_requests` is
+    unset.
+    """
+
+    def __init__(
+        self,
+        workspaces: list[FakeWorkspace],
+        org: str = "org",
+        latency: Latency = 0.0,
+        throttle_every: int = 0,
+        throttle_burst: int = 0,
+        throttle_reset: float = 0.01,
+        error_rate: float = 0.0,
+        run_lifecycle: tuple[str, ...] = RUN_LIFECYCLE,
+        seed: int = 0,
+        record_requests: bool = True,
+    ) -> None:
+        self.workspaces = workspaces
+        self._by_id = {ws.id: ws for ws in workspaces}
+        self.org = org
+        self.latency = latency
+        self.throttle_every = throttle_every
+        self.throttle_burst = throttle_burst
+        self.throttle_reset = throttle_reset
+        self.error_rate = error_rate
+        self.run_lifecycle = run_lifecycle
+        self.record_requests = record_requests
+
+        self.random = random.Random(seed)
+        self.requests: list[httpx.Request] = []
+        # How many requests were received, recorded or not.
+        self.handled = 0
+        self.status_codes: Counter[int] = Counter()
+        self.runs: dict[str, FakeRun] = {}
+        # The last run created in each workspace.
+        self._current_runs: dict[str, FakeRun] = {}
+        self._run_ids = count(1)
+
+    @property
+    def transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self.handle)
+
+    @property
+    def triggered(self) -> list[str]:
+        """The IDs of the workspaces where runs were created, in order."""
+
+        return [run.workspace_id for run in self.runs.values()]
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        self.handled += 1
+        if self.record_requests:
+            self.requests.append(request)
+
+        latency = self.latency
+        if callable(latency):
+            latency = latency(self.random)
+        if latency:
+            await asyncio.sleep(latency)
+
+        response = self._fault() or self._route(request)
+        self.status_codes[response.status_code] += 1
+        return response
+
+    def _fault(self) -> httpx.Response | None:
+        if self.throttle_every:
+            position = (self.handled - 1) % self.throttle_every
+            if position >= self.throttle_every - self.throttle_burst:
+                headers = {
+                    "X-RateLimit-Remaining": "0",
+                    "X-RateLimit-Reset": str(self.throttle_reset),
+                }
+                return httpx.Response(429, headers=headers, json={"errors": []})
+
+        if self.error_rate and self.random.random() < self.error_rate:
+            return httpx.Response(503, json={"errors": [{"status": "503"}]})
+
+        return None
+
+    def _route(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+
+        if request.method == "GET" and (m := _WORKSPACES.fullmatch(path)):
+            if m.group(1) == self.org:
+                return self._list_workspaces(request)
+        elif request.method == "GET" and (m := _RUNS.fullmatch(path)):
+            if m.group(1) == self.org:
+                return self._list_runs(request)
+        elif request.method == "POST" and path == _CREATE_RUN:
+            return self._create_run(request)
+
+        return httpx.Response(404, json={"errors": [{"status": "404"}]})
+
+    def _list_workspaces(self, request: httpx.Request) -> httpx.Response:
+        params = request.url.params
+        included_tags = _split(params.get("search[tags]"))
+        excluded_tags = _split(params.get("search[exclude-tags]"))
+
+        workspaces = [
+            ws
+            for ws in self.workspaces
+            if included_tags <= set(ws.tags) and not excluded_tags & set(ws.tags)
+        ]
+        data, meta = self._paginate(request, workspaces)
+
+        resources = []
+        included = []
+        for ws in data:
+            resource: dict[str, Any] = {
+                "id": ws.id,
+                "type": "workspaces",
+                "attributes": {
+                    "name": ws.name,
+                    "tag-names": ws.tags,
+                    "execution-mode": ws.execution_mode,
+                },
+            }
+
+            run = self._current_run(ws)
+            if run is not None:
+                ref = {"id": run["id"], "type": "runs"}
+                resource["relationships"] = {"current-run": {"data": ref}}
+                if params.get("include") == "current_run":
+                    included.append(run)
+
+            resources.append(resource)
+
+        body = json.dumps({"data": resources, "included": included, "meta": meta})
+        etag = f'W/"{blake2b(body.encode(), digest_size=8).hexdigest()}"'
+        if request.headers.get("if-none-match") == etag:
+            return httpx.Response(304, headers={"ETag": etag})
+
+        headers = {"ETag": etag, "Content-Type": "application/vnd.api+json"}
+        return httpx.Response(200, content=body.encode(), headers=headers)
+
+    def _current_run(self, ws: FakeWorkspace) -> dict[str, Any] | None:
+        run = self._current_runs.get(ws.id)
+        if run is not None:
+            return run.resource()
+
+        if ws.run_status is None:
+            return None
+
+        attributes = {"status": ws.run_status}
+        return {"id": f"run-{ws.id}", "type": "runs", "attributes": attributes}
+
+    def _create_run(self, request: httpx.Request) -> httpx.Response:
+        data = json.loads(request.content)["data"]
+        workspace_id = data["relationships"]["workspace"]["data"]["id"]
+
+        workspace = self._by_id.get(workspace_id)
+        if workspace is None:
+            return httpx.Response(404, json={"errors": [{"status": "404"}]})
+
+        run = FakeRun(
+            f"run-{next(self._run_ids)}",
+            workspace_id,
+            workspace.run_lifecycle or self.run_lifecycle,
+        )
+        self.runs[run.id] = run
+        self._current_runs[workspace_id] = run
+        return httpx.Response(201, json={"data": run.resource()})
+
+    def _list_runs(self, request: httpx.Request) -> httpx.Response:
+        runs = list(reversed(self.runs.values()))
+
+        # Each listing moves the runs forward.
+        if request.url.params.get("page[number]", "1") == "1":
+            for run in runs:
+                run.polls += 1
+
+        data, meta = self._paginate(request, runs)
+        return httpx.Response(
+            200, json={"data": [run.resource() for run in data], "meta": meta}
+        )
+
+    def _paginate(
+        self, request: httpx.Request, items: list[Any]
+    ) -> tuple[list[Any], dict[str, Any]]:
+        number = int(request.url.params.get("page[number]", 1))
+        size = int(request.url.params.get("page[size]", DEFAULT_PAGE_SIZE))
+        total_pages = max(1, -(-len(items) // size))
+
+        meta = {
+            "pagination": {
+                "current-page": number,
+                "total-pages": total_pages,
+                "total-count": len(items),
+            },
+        }
+        return items[(number - 1) * size : number * size], meta
+
+
+def _split(value: str | None) -> set[str]:
+    return set(value.split(",")) if value else set()
@@ -0,0 +1,55 @@
+import asyncio
+from pathlib import Path
+
+from multani.checkpoint import Checkpoint
+from multani.checkpoint import LocalFileCheckpointStore
+from multani.checkpoint import ObjectStoreCheckpointStore
+
+
+class MemoryObjectStore:
+    def __init__(self) -> None:
+        self.objects: dict[str, bytes] = {}
+
+    async def get(self, name: str) -> bytes | None:
+        return self.objects.get(name)
+
+    async def put(self, name: str, data: bytes) -> None:
+        self.objects[name] = data
+
+
+def test_local_file_checkpoint(tmp_path: Path) -> None:
+    store = LocalFileCheckpointStore(tmp_path / "checkpoints")
+
+    async def run() -> Checkpoint:
+        checkpoint = await Checkpoint.load(store, "message/1")
+        assert len(checkpoint) == 0
+
+        checkpoint.flush_every = 2
+        for entry in ["ws-1", "ws-2", "ws-3"]:
+            await checkpoint.add(entry)
+
+        # Only the first 2 entries were written so far.
+        assert await store.load("message/1") == {"ws-1", "ws-2"}
+
+        await checkpoint.flush()
+        return await Checkpoint.load(store, "message/1")
+
+    checkpoint = asyncio.run(run())
+    assert "ws-3" in checkpoint
+    assert checkpoint.entries == {"ws-1", "ws-2", "ws-3"}
+
+
+def test_object_store_checkpoint() -> None:
+    objects = MemoryObjectStore()
+    store = ObjectStoreCheckpointStore(objects, "checkpoints/")
+
+    async def run() -> Checkpoint:
+        checkpoint = await Checkpoint.load(store, "1")
+        await checkpoint.add("ws-2")
+        await checkpoint.add("ws-1")
+        await checkpoint.flush()
+        return await Checkpoint.load(store, "1")
+
+    checkpoint = asyncio.run(run())
+    assert checkpoint.entries == {"ws-1", "ws-2"}
+    assert objects.objects == {"checkpoints/1": b"ws-1\nws-2\n"}
@@ -6,8 +6,10 @@ from flask import Request
 from pydantic import ValidationError
 from werkzeug.test import EnvironBuilder
 
+from multani.google import models
 from multani.google.models import ErrorReporting
-from multani.google.models import is_test_notification
+from multani.google.models import notification_from_request
+from multani.google.models import parse_notification
 
 FIXTURES = Path(os.path.abspath(__file__)).parent / "fixtures"
 
@@ -25,17 +27,16 @@ def test_parse_test_notification() -> None:
     payload = FIXTURES / "error-reporting" / "test-notification-1.json"
     request = new_request(payload.read_text())
 
-    with pytest.raises(ValidationError):
-        ErrorReporting.from_request(request)
-
-    assert is_test_notification(request)
+    notification = notification_from_request(request)
+    assert isinstance(notification, models.TestNotification)
 
 
 def test_parse_error_1() -> None:
     payload = FIXTURES / "error-reporting" / "error-1.json"
     request = new_request(payload.read_text())
 
-    e = ErrorReporting.from_request(request)
+    e = notification_from_request(request)
+    assert isinstance(e, ErrorReporting)
     assert e.version == "1.0"
 
 
@@ -68,5 +69,31 @@ def test_parse_error_broken_json() -> None:
     """
     request = new_request(payload)
 
-    e = ErrorReporting.from_request(request)
+    e = notification_from_request(request)
+    assert isinstance(e, ErrorReporting)
     assert e.version == "1.0"
+    assert e.event_info.log_message.endswith("KeyError: 'data'")
+
+
+def test_parse_notification() -> None:
+    payload = FIXTURES / "error-reporting" / "test-notification-1.json"
+    notification = parse_notification(payload.read_bytes())
+    assert isinstance(notification, models.TestNotification)
+    assert notification.incident.incident_id == "12345"
+
+    payload = FIXTURES / "error-reporting" / "error-1.json"
+    notification = parse_notification(payload.read_bytes())
+    assert isinstance(notification, ErrorReporting)
+    assert notification.group_info.project_id == "test123"
+
+    # Any version but "test" is an error.
+    data = payload.read_bytes().replace(b'"version": "1.0"', b'"version": "2.0"')
+    notification = parse_notification(data)
+    assert isinstance(notification, ErrorReporting)
+    assert notification.version == "2.0"
+
+    with pytest.raises(ValidationError):
+        parse_notification(b'{"version": "1.0", "subject": "incomplete"}')
+
+    with pytest.raises(ValueError):
+        notification_from_request(Request(EnvironBuilder(data="{}").get_environ()))
@@ -0,0 +1,106 @@
+import asyncio
+import threading
+
+import pytest
+from cloudevents.http.event import CloudEvent
+from flask import Request
+from opentelemetry import trace
+from opentelemetry.trace import NonRecordingSpan
+from opentelemetry.trace import SpanContext
+from structlog.testing import capture_logs
+from werkzeug.test import EnvironBuilder
+
+from multani import functions_framework
+from multani.functions_framework import BackgroundLoop
+
+SPAN = NonRecordingSpan(SpanContext(trace_id=1, span_id=2, is_remote=False))
+
+
+def test_background_loop() -> None:
+    background = BackgroundLoop()
+    closed = []
+
+    async def close() -> None:
+        closed.append(asyncio.get_running_loop())
+
+    background.on_shutdown(close)
+
+    async def get_loop() -> tuple[asyncio.AbstractEventLoop, threading.Thread]:
+        return asyncio.get_running_loop(), threading.current_thread()
+
+    loop1, thread1 = background.run(get_loop())
+    loop2, thread2 = background.run(get_loop())
+
+    # The same loop is reused between calls, in its own thread.
+    assert loop1 is loop2
+    assert thread1 is thread2
+    assert thread1 is not threading.current_thread()
+    assert loop1.get_exception_handler() is not None
+
+    background.stop()
+    assert closed == [loop1]
+    assert loop1.is_closed()
+
+
+def test_background_loop_error() -> None:
+    background = BackgroundLoop()
+
+    async def fail() -> None:
+        raise ValueError("oops")
+
+    with pytest.raises(ValueError):
+        background.run(fail())
+
+    background.stop()
+
+
+def test_async_cloud_event() -> None:
+    calls = []
+
+    @functions_framework.async_cloud_event
+    async def handler(event: CloudEvent) -> None:
+        calls.append((event.data, threading.current_thread(), trace.get_current_span()))
+        if event.data == "fail":
+            raise ValueError("oops")
+
+    with trace.use_span(SPAN):
+        handler(CloudEvent({"type": "test", "source": "test"}, "ok"))
+
+    # The handler ran in the background loop, in the trace of the caller.
+    [(data, thread, span)] = calls
+    assert data == "ok"
+    assert thread is not threading.current_thread()
+    assert span is SPAN
+
+    # The errors are logged, not raised.
+    with capture_logs() as logs:
+        handler(CloudEvent({"type": "test", "source": "test"}, "fail"))
+
+    [log] = logs
+    assert log["log_level"] == "error"
+    assert isinstance(log["exception"], ValueError)
+
+
+def test_async_http() -> None:
+    spans = []
+
+    @functions_framework.async_http
+    async def handler(request: Request) -> tuple[str, int]:
+        spans.append(trace.get_current_span())
+        if request.args.get("fail"):
+            raise ValueError("oops")
+        return "OK", 200
+
+    def new_request(query: str) -> Request:
+        return Request(EnvironBuilder(query_string=query).get_environ())
+
+    with trace.use_span(SPAN):
+        assert handler(new_request("")) == ("OK", 200)
+    assert spans == [SPAN]
+
+    # The errors are logged, and answered with an error.
+    with capture_logs() as logs:
+        assert handler(new_request("fail=1")) == ("Error", 500)
+
+    [log] = logs
+    assert isinstance(log["exception"], ValueError)
@@ -1,5 +1,7 @@
+import asyncio
 from typing import Generator
 
+import httpx
 import pytest
 from flask import Flask
 from flask import request
@@ -46,3 +48,90 @@ def test_http_auth_fail(client: FlaskClient) -> None:
     r = client.get("/")
     assert r.status == "401 UNAUTHORIZED"
     assert r.text == "Unauthorized"
+
+
+def retry_transport(
+    statuses: list[int],
+) -> tuple[httpx.MockTransport, list[httpx.Request]]:
+    responses = iter(statuses)
+    requests: list[httpx.Request] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(next(responses))
+
+    return httpx.MockTransport(handler), requests
+
+
+def test_send_with_retry() -> None:
+    transport, requests = retry_transport([503, 429, 201])
+    client = httpx.AsyncClient(transport=transport)
+    policy = http.RetryPolicy(base_delay=0.001)
+
+    r = asyncio.run(http.send_with_retry(lambda: client.post("http://test"), policy))
+
+    assert r.status_code == 201
+    assert len(requests) == 3
+
+
+def test_send_with_retry_gives_up() -> None:
+    transport, requests = retry_transport([503] * 10)
+    client = httpx.AsyncClient(transport=transport)
+    policy = http.RetryPolicy(max_attempts=3, base_delay=0.001)
+
+    r = asyncio.run(http.send_with_retry(lambda: client.post("http://test"), policy))
+
+    assert r.status_code == 503
+    assert len(requests) == 3
+
+
+def test_send_with_retry_budget() -> None:
+    transport, requests = retry_transport([503] * 10)
+    client = httpx.AsyncClient(transport=transport)
+    policy = http.RetryPolicy(base_delay=0.001)
+    budget = http.RetryBudget(ratio=0, initial=1)
+
+    r = asyncio.run(
+        http.send_with_retry(lambda: client.post("http://test"), policy, budget)
+    )
+
+    assert r.status_code == 503
+    assert len(requests) == 2
+    assert budget.retries == 1
+    assert budget.exhausted == 1
+
+
+def test_retry_after() -> None:
+    r = httpx.Response(503, headers={"Retry-After": "3"})
+    assert http.retry_after(r) == 3
+
+    r = httpx.Response(503, headers={"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"})
+    assert http.retry_after(r) == 0
+
+    r = httpx.Response(429, headers={"X-RateLimit-Reset": "0.5"})
+    assert http.retry_after(r) == 0.5
+
+    r = httpx.Response(503)
+    assert http.retry_after(r) is None
+
+    # Waiting longer than the policy allows: don't retry.
+    r = httpx.Response(503, headers={"Retry-After": "3600"})
+    assert http.RetryPolicy().delay(1, r) is None
+
+
+def test_shared_client() -> None:
+    async def get_clients() -> tuple[httpx.AsyncClient, httpx.AsyncClient]:
+        return http.shared_client(), http.shared_client()
+
+    async def close() -> httpx.AsyncClient:
+        client = http.shared_client()
+        await http.close_shared_client()
+        return client
+
+    c1, c2 = asyncio.run(get_clients())
+    assert c1 is c2
+
+    # Each event loop gets its own client.
+    c3 = asyncio.run(close())
+    assert c3 is not c1
+    assert c3.is_closed
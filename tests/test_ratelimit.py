@@ -0,0 +1,57 @@
+import asyncio
+import time
+
+import httpx
+
+from multani.ratelimit import AdaptiveLimiter
+from multani.ratelimit import TokenBucket
+
+
+def test_token_bucket_rate() -> None:
+    bucket = TokenBucket(rate=100, capacity=1)
+
+    async def consume() -> float:
+        start = time.monotonic()
+        for _ in range(11):
+            await bucket.acquire()
+        return time.monotonic() - start
+
+    # The first token is available right away, the next ones every 10ms.
+    elapsed = asyncio.run(consume())
+    assert 0.09 < elapsed < 0.5
+
+
+def test_adaptive_limiter_aimd() -> None:
+    limiter = AdaptiveLimiter(rate=30, initial_concurrency=4, target_latency=1)
+
+    for _ in range(4):
+        limiter.observe(httpx.Response(200), latency=0.1)
+    assert 4.9 < limiter.concurrency < 5
+
+    limiter.observe(httpx.Response(429, headers={"X-RateLimit-Reset": "0.1"}), 0.1)
+    assert 2.4 < limiter.concurrency < 2.5
+
+    # Other responses throttled at the same time don't decrease it further.
+    limiter.observe(httpx.Response(429), latency=0.1)
+    assert 2.4 < limiter.concurrency < 2.5
+
+
+def test_adaptive_limiter_concurrency() -> None:
+    limiter = AdaptiveLimiter(rate=1000, initial_concurrency=2, max_concurrency=2)
+    in_flight = 0
+    max_in_flight = 0
+
+    async def send() -> httpx.Response:
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return httpx.Response(200)
+
+    async def run() -> None:
+        await asyncio.gather(*[limiter.request(send) for _ in range(10)])
+
+    asyncio.run(run())
+    assert max_in_flight == 2
+    assert limiter.in_flight == 0
@@ -0,0 +1,72 @@
+import pytest
+from pydantic import ValidationError
+
+from multani.models import TerraformCloudTriggerAllRequest
+from multani.tfcloud.models import WorkspaceRecord
+from multani.tfcloud.selector import Selector
+from multani.tfcloud.selector import SelectorError
+from multani.tfcloud.selector import parse
+
+
+def workspace(name: str, tags: list[str], mode: str = "remote") -> WorkspaceRecord:
+    return WorkspaceRecord(f"ws-{name}", name, tuple(tags), mode)
+
+
+WORKSPACES = [
+    workspace("prod-network", ["prod", "network"]),
+    workspace("prod-dns", ["prod", "dns", "ignore"]),
+    workspace("dev-network", ["dev", "network"]),
+    workspace("dev-agent", ["dev"], mode="agent"),
+]
+
+
+@pytest.mark.parametrize(
+    "expression,includes,excludes,expected",
+    [
+        (None, [], [], ["prod-network", "prod-dns", "dev-network"]),
+        (None, ["prod"], ["ignore"], ["prod-network"]),
+        ("network", [], [], ["prod-network", "dev-network"]),
+        ("tag:prod and not tag:ignore", [], [], ["prod-network"]),
+        ("name:dev-* or tag:dns", [], [], ["prod-dns", "dev-network"]),
+        ("not (tag:prod or tag:network)", [], [], []),
+        ("mode:agent or mode:remote", [], ["prod"], ["dev-network", "dev-agent"]),
+        ("name:*-network", ["dev"], [], ["dev-network"]),
+    ],
+)
+def test_select(
+    expression: str | None,
+    includes: list[str],
+    excludes: list[str],
+    expected: list[str],
+) -> None:
+    selector = Selector(expression, includes, excludes)
+    selected = selector.select(WORKSPACES)
+    assert [ws.name for ws in selected] == expected
+
+
+def test_values_are_not_evaluated() -> None:
+    selector = Selector("name:x'or'1 or mode:__debug__")
+    assert not selector.matches("prod-network", [], "remote")
+    assert selector.matches("x'or'1", [], "remote")
+    assert selector.matches("prod-network", [], "__debug__")
+
+
+@pytest.mark.parametrize(
+    "expression",
+    ["", "tag:a and", "(tag:a", "tag:a)", "foo:bar", "tag:", "and tag:a", "a b"],
+)
+def test_parse_error(expression: str) -> None:
+    with pytest.raises(SelectorError):
+        parse(expression)
+
+
+def test_request_selector() -> None:
+    request = TerraformCloudTriggerAllRequest(
+        organization="org", secret_name="secret", selector="tag:a or tag:b"
+    )
+    assert request.selector == "tag:a or tag:b"
+
+    with pytest.raises(ValidationError):
+        TerraformCloudTriggerAllRequest(
+            organization="org", secret_name="secret", selector="tag:a or"
+        )
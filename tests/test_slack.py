@@ -0,0 +1,133 @@
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+
+from multani.http import RetryPolicy
+from multani.slack import AsyncSlackClient
+from multani.slack import ChannelScheduler
+from multani.slack import SlackApiError
+
+
+def slack_api(requests: list[tuple[float, dict[str, str]]]) -> httpx.MockTransport:
+    """Throttle the first call, fail the calls to channel "C404"."""
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        requests.append((time.monotonic(), body))
+        assert request.headers["authorization"] == "Bearer token"
+
+        if len(requests) == 1:
+            return httpx.Response(429, headers={"Retry-After": "0.05"})
+        if body["channel"] == "C404":
+            return httpx.Response(200, json={"ok": False, "error": "not_in_channel"})
+        return httpx.Response(200, json={"ok": True, "ts": f"{len(requests)}.000"})
+
+    return httpx.MockTransport(handler)
+
+
+def test_async_slack_client() -> None:
+    requests: list[tuple[float, dict[str, str]]] = []
+    scheduler = ChannelScheduler(interval=0.05)
+
+    async def run() -> list[str]:
+        async with httpx.AsyncClient(transport=slack_api(requests)) as http:
+            client = AsyncSlackClient(
+                "token", scheduler, http, RetryPolicy(base_delay=0.001)
+            )
+            posts = [
+                client.post_message("C1", text="one"),
+                client.post_message("C1", text="two"),
+                client.post_message("C2", text="three"),
+                client.post_message("C1", text="four"),
+            ]
+            return list(await asyncio.gather(*posts))
+
+    timestamps = asyncio.run(run())
+    assert len(set(timestamps)) == 4
+
+    # The throttled call was retried, and the calls to C1 were spaced.
+    sent = [(at, body["text"]) for at, body in requests if body["channel"] == "C1"]
+    assert sorted(text for _, text in sent) == ["four", "one", "one", "two"]
+    assert all(b - a >= 0.04 for (a, _), (b, _) in zip(sent, sent[1:]))
+
+    # The calls to C2 were not delayed.
+    [c2] = [at for at, body in requests if body["channel"] == "C2"]
+    assert c2 < sent[1][0]
+
+
+def test_async_slack_client_error() -> None:
+    # Don't throttle the first call.
+    requests: list[tuple[float, dict[str, str]]] = [(0, {})]
+
+    async def run() -> None:
+        async with httpx.AsyncClient(transport=slack_api(requests)) as http:
+            client = AsyncSlackClient("token", http=http)
+            with pytest.raises(SlackApiError):
+                await client.post_message("C404", text="hello")
+            with pytest.raises(ValueError):
+                await client.post_message("C1")
+
+    asyncio.run(run())
+
+
+def test_async_slack_client_gateway_errors() -> None:
+    calls: list[str] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.path)
+        if len(calls) % 2:
+            return httpx.Response(503)
+        return httpx.Response(200, json={"ok": True, "ts": "1.0"})
+
+    async def run() -> None:
+        transport = httpx.MockTransport(handler)
+        async with httpx.AsyncClient(transport=transport) as http:
+            client = AsyncSlackClient(
+                "token", ChannelScheduler(interval=0), http, RetryPolicy(base_delay=0)
+            )
+            # The message may have been posted: don't post it again.
+            with pytest.raises(httpx.HTTPStatusError):
+                await client.post_message("C1", text="hello")
+
+            calls.clear()
+            await client.update_message("C1", "1.0", text="hello")
+
+    asyncio.run(run())
+
+    # Updating the message again is harmless.
+    assert calls == ["/api/chat.update", "/api/chat.update"]
+
+
+def test_async_slack_client_upload_file() -> None:
+    requests: list[httpx.Request] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        if request.url.path == "/api/files.getUploadURLExternal":
+            upload = {"upload_url": "https://files.slack.com/upload/1", "file_id": "F1"}
+            return httpx.Response(200, json={"ok": True} | upload)
+        if request.url.host == "files.slack.com":
+            return httpx.Response(200, text="OK - 5")
+        return httpx.Response(200, json={"ok": True})
+
+    async def run() -> str:
+        transport = httpx.MockTransport(handler)
+        async with httpx.AsyncClient(transport=transport) as http:
+            client = AsyncSlackClient("token", http=http)
+            return await client.upload_file(
+                "C1", "traceback.txt", b"hello", title="Traceback", thread_ts="1.0"
+            )
+
+    assert asyncio.run(run()) == "F1"
+
+    [get_url, upload, complete] = requests
+    assert get_url.content == b"filename=traceback.txt&length=5"
+    assert upload.content == b"hello"
+
+    form = dict(httpx.QueryParams(complete.content.decode()))
+    assert form["channel_id"] == "C1"
+    assert form["thread_ts"] == "1.0"
+    assert json.loads(form["files"]) == [{"id": "F1", "title": "Traceback"}]
@@ -0,0 +1,112 @@
+import asyncio
+
+import pytest
+
+from multani.slack import SlackMessage
+from multani.slack_coalescing import ErrorCoalescer
+
+
+class FakeSlack:
+    def __init__(self) -> None:
+        self.posted: list[SlackMessage] = []
+        self.updates: list[tuple[str, str]] = []
+
+    async def post(self, message: SlackMessage) -> str:
+        self.posted.append(message)
+        return f"ts-{len(self.posted)}"
+
+    async def update(self, message: SlackMessage, ts: str) -> None:
+        assert message.blocks is not None
+        self.updates.append((ts, message.blocks[-1]["elements"][0]["text"]))
+
+
+def error(group: str) -> SlackMessage:
+    blocks = [{"type": "header", "text": {"type": "plain_text", "text": group}}]
+    return SlackMessage("C123", blocks=blocks, group=group)
+
+
+def test_coalesce_errors() -> None:
+    slack = FakeSlack()
+
+    async def run() -> None:
+        coalescer = ErrorCoalescer(slack.post, slack.update, update_delay=0.01)
+
+        for _ in range(20):
+            await coalescer.notify(error("group-1"))
+        await coalescer.notify(error("group-2"))
+        await coalescer.notify(SlackMessage("C123", text="Testing"))
+
+        await asyncio.sleep(0.05)
+        await coalescer.notify(error("group-1"))
+        await coalescer.flush()
+
+    asyncio.run(run())
+
+    # One message per group, updated with the number of notifications.
+    assert len(slack.posted) == 3
+    assert [ts for ts, _ in slack.updates] == ["ts-1", "ts-1"]
+    assert slack.updates[0][1].startswith("🔁 Seen 20 times since")
+    assert slack.updates[1][1].startswith("🔁 Seen 21 times since")
+
+
+def test_coalesce_window_and_lru() -> None:
+    slack = FakeSlack()
+
+    async def run() -> None:
+        coalescer = ErrorCoalescer(slack.post, slack.update, window=0, max_groups=2)
+
+        # Out of the window: posted again.
+        await coalescer.notify(error("group-1"))
+        await asyncio.sleep(0.01)
+        await coalescer.notify(error("group-1"))
+
+        coalescer.window = 60
+        await coalescer.notify(error("group-2"))
+        await coalescer.notify(error("group-3"))
+        assert list(coalescer.groups) == ["group-2", "group-3"]
+
+        # Evicted: posted again.
+        await coalescer.notify(error("group-1"))
+        await coalescer.flush()
+
+    asyncio.run(run())
+
+    assert len(slack.posted) == 5
+    assert slack.updates == []
+
+
+def test_coalesce_first_post_fails() -> None:
+    slack = FakeSlack()
+    release = asyncio.Event()
+    failures = [RuntimeError("Slack is down")]
+
+    async def post(message: SlackMessage) -> str:
+        await release.wait()
+        if failures:
+            raise failures.pop()
+        return await slack.post(message)
+
+    async def run() -> None:
+        coalescer = ErrorCoalescer(post, slack.update, update_delay=0.01)
+
+        # The next notifications wait for the first message to be posted.
+        first = asyncio.create_task(coalescer.notify(error("group-1")))
+        await asyncio.sleep(0)
+        others = [
+            asyncio.create_task(coalescer.notify(error("group-1"))) for _ in range(3)
+        ]
+        await asyncio.sleep(0)
+        assert not any(task.done() for task in others)
+
+        # The first post fails: the next notification posts its own message,
+        # the other ones are counted in it.
+        release.set()
+        with pytest.raises(RuntimeError):
+            await first
+        await asyncio.gather(*others)
+        await coalescer.flush()
+
+    asyncio.run(run())
+
+    assert len(slack.posted) == 1
+    assert slack.updates[-1][1].startswith("🔁 Seen 3 times since")
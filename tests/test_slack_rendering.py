@@ -0,0 +1,57 @@
+import json
+import os.path
+from pathlib import Path
+
+from multani.google.models import ErrorReporting
+from multani.slack_rendering import HEADER_LIMIT
+from multani.slack_rendering import LOG_MESSAGE_LIMIT
+from multani.slack_rendering import render_error
+
+FIXTURES = Path(os.path.abspath(__file__)).parent / "fixtures"
+
+
+def load_error() -> ErrorReporting:
+    payload = FIXTURES / "error-reporting" / "error-1.json"
+    return ErrorReporting.model_validate_json(payload.read_bytes())
+
+
+def test_render_error() -> None:
+    error = load_error()
+    rendered = render_error(error)
+
+    [header, section, log] = rendered.blocks
+    assert header["text"]["text"] == f"🚨 {error.subject}"
+    assert section["fields"][0]["text"] == f"*Type:*\n`{error.exception_info.type}`"
+    assert error.group_info.detail_link in section["fields"][2]["text"]
+    text = log["elements"][0]["elements"][0]["text"]
+    assert text == error.event_info.log_message
+
+    assert rendered.size == len(
+        json.dumps(rendered.blocks, ensure_ascii=False).encode()
+    )
+    assert rendered.attachment is None
+
+
+def test_render_error_truncated() -> None:
+    error = load_error()
+    error.subject = "Very long subject " * 20
+    error.event_info.log_message = "".join(
+        f'  File "module_{i}.py", line {i}, in function_{i}\n' for i in range(1000)
+    )
+    error.event_info.log_message += "KeyError: 'data'"
+
+    rendered = render_error(error, head=0.5)
+
+    [header, _, log] = rendered.blocks
+    assert len(header["text"]["text"]) <= HEADER_LIMIT
+
+    # The start and the end of the traceback are kept.
+    text = log["elements"][0]["elements"][0]["text"]
+    assert len(text) <= LOG_MESSAGE_LIMIT
+    assert text.startswith('  File "module_0.py"')
+    assert text.endswith("KeyError: 'data'")
+    assert "chars …]" in text
+
+    # The full traceback is attached.
+    assert rendered.attachment is not None
+    assert rendered.attachment.content == error.event_info.log_message
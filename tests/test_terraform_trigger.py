@@ -2,9 +2,12 @@ import json
 from base64 import urlsafe_b64encode
 from typing import Any
 
+import pytest
 from cloudevents.http import CloudEvent
+from pydantic import ValidationError
 
 from multani.models import TerraformCloudTriggerAllRequest
+from multani.tfcloud.models import WorkspaceRef
 
 
 def json_b64(value: Any) -> str:
@@ -45,3 +48,95 @@ def test_parse_terraform_trigger_request() -> None:
     assert m.organization == "test"
     assert m.tags_included == []
     assert m.tags_excluded == ["ignore"]
+    assert m.message_id == "1"
+
+
+def test_follow_up_request() -> None:
+    payload = {"organization": "test", "secret_name": "some/secret"}
+    request = TerraformCloudTriggerAllRequest.from_cloud_event(
+        create_cloud_event(payload)
+    )
+    remaining = [WorkspaceRef(id="ws-1", name="one")]
+
+    follow_up = request.follow_up(remaining, listed_all=True)
+    assert follow_up.workspaces == remaining
+    assert follow_up.checkpoint == "1"
+
+    follow_up = request.follow_up(remaining, listed_all=False)
+    assert follow_up.workspaces is None
+    assert follow_up.checkpoint == "1"
+
+    # The follow-up request can be sent as a message again.
+    data = json.loads(follow_up.model_dump_json(exclude_defaults=True))
+    assert data == {
+        "organization": "test",
+        "secret_name": "some/secret",
+        "checkpoint_key": "1",
+    }
+
+
+def test_shard_requests() -> None:
+    payload = {"organization": "test", "secret_name": "some/secret", "shards": 4}
+    request = TerraformCloudTriggerAllRequest.from_cloud_event(
+        create_cloud_event(payload)
+    )
+    workspaces = [WorkspaceRef(id=f"ws-{i}", name=f"ws{i}") for i in range(100)]
+
+    shards = request.shard_requests(workspaces)
+    assert len(shards) == 4
+    assert all(shard.shards == 1 for shard in shards)
+    assert [shard.checkpoint for shard in shards] == [f"1-shard-{i}" for i in range(4)]
+
+    # Each workspace is in exactly one shard, always the same one.
+    triggered = [ws.id for shard in shards for ws in shard.workspaces or []]
+    assert sorted(triggered) == sorted(ws.id for ws in workspaces)
+    assert request.shard_requests(workspaces[::-1])[0].workspaces == sorted(
+        shards[0].workspaces or [], key=lambda ws: -int(ws.id[3:])
+    )
+
+
+def test_organizations_request() -> None:
+    payload = {
+        "organizations": [
+            {"organization": "one", "secret_name": "some/secret"},
+            {"organization": "two", "secret_name": "some/secret", "shards": 2},
+        ],
+    }
+    request = TerraformCloudTriggerAllRequest.from_cloud_event(
+        create_cloud_event(payload)
+    )
+
+    targets = request.targets()
+    assert [t.organization for t in targets] == ["one", "two"]
+    assert [t.checkpoint for t in targets] == ["1-org-0", "1-org-1"]
+    assert [t.shards for t in targets] == [1, 2]
+    assert all(t.organizations == [] for t in targets)
+
+
+def test_organizations_request_validation() -> None:
+    with pytest.raises(ValidationError):
+        TerraformCloudTriggerAllRequest.model_validate({"organization": "test"})
+
+    with pytest.raises(ValidationError):
+        TerraformCloudTriggerAllRequest.model_validate(
+            {
+                "organization": "test",
+                "secret_name": "some/secret",
+                "organizations": [{"organization": "one", "secret_name": "s"}],
+            }
+        )
+
+    for field, value in [
+        ("tags_included", ["prod"]),
+        ("selector", "tag:prod"),
+        ("priorities", {"high": 10}),
+        ("shards", 2),
+        ("workspaces", []),
+    ]:
+        with pytest.raises(ValidationError, match=field):
+            TerraformCloudTriggerAllRequest.model_validate(
+                {
+                    "organizations": [{"organization": "one", "secret_name": "s"}],
+                    field: value,
+                }
+            )
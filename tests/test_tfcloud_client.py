@@ -0,0 +1,496 @@
+import asyncio
+import json
+import time
+from pathlib import Path
+
+import httpx
+import pytest
+import structlog
+from opentelemetry.trace import INVALID_SPAN
+from structlog.testing import capture_logs
+
+from multani.checkpoint import Checkpoint
+from multani.checkpoint import LocalFileCheckpointStore
+from multani.deadline import Deadline
+from multani.http import RetryPolicy
+from multani.ratelimit import AdaptiveLimiter
+from multani.tfcloud import DeadlineExceeded
+from multani.tfcloud import TerraformCloud
+from multani.tfcloud.client import DEADLINE_MARGIN
+from multani.tfcloud.client import PRIORITY_LISTING_MARGIN
+from multani.tfcloud.inventory import InventoryCache
+from multani.tfcloud.models import WorkspacePage
+from multani.tfcloud.models import WorkspaceRecord
+from multani.tfcloud.models import WorkspaceRef
+from multani.tfcloud.report import MAX_ERROR_LENGTH
+from multani.tfcloud.report import MAX_NAMES
+from multani.tfcloud.report import SAMPLE_SIZE
+from multani.tfcloud.report import SLOWEST
+from multani.tfcloud.report import TriggerReport
+from multani.tfcloud.report import WorkspaceResult
+from multani.tfcloud.report import WorkspaceStatus
+from tests.fake_tfcloud import FakeTerraformCloud
+from tests.fake_tfcloud import make_workspace
+
+
+def make_client(transport: httpx.AsyncBaseTransport) -> TerraformCloud:
+    http = httpx.AsyncClient(transport=transport)
+    # Don't slow the tests down with the real API rate limit.
+    limiter = AdaptiveLimiter(rate=10_000, initial_concurrency=32)
+    return TerraformCloud(http, "token", limiter)
+
+
+def fetch_all(
+    tfcloud: TerraformCloud, includes: list[str], excludes: list[str]
+) -> list[WorkspaceRecord]:
+    async def fetch() -> list[WorkspaceRecord]:
+        return [ws async for ws in tfcloud.fetch_workspaces("org", includes, excludes)]
+
+    return asyncio.run(fetch())
+
+
+def test_fetch_workspaces_all_pages() -> None:
+    workspaces = [make_workspace(i) for i in range(250)]
+    fake = FakeTerraformCloud(workspaces)
+    requests = fake.requests
+    tfcloud = make_client(fake.transport)
+
+    fetched = fetch_all(tfcloud, [], [])
+
+    assert sorted(ws.id for ws in fetched) == sorted(ws.id for ws in workspaces)
+    assert len(requests) == 3
+    assert requests[0].url.params["page[number]"] == "1"
+
+
+def test_fetch_workspaces_filters() -> None:
+    workspaces = [
+        make_workspace(1, ["prod", "network"]),
+        make_workspace(2, ["prod"]),
+        make_workspace(3, ["prod", "network", "ignore"]),
+        make_workspace(4, ["dev", "network"]),
+    ]
+    workspaces[1].execution_mode = "local"
+
+    fake = FakeTerraformCloud(workspaces)
+    requests = fake.requests
+    tfcloud = make_client(fake.transport)
+
+    fetched = fetch_all(tfcloud, ["network"], ["ignore"])
+    assert sorted(ws.id for ws in fetched) == ["ws-1", "ws-4"]
+
+    # The filters are sent to the API too.
+    params = requests[-1].url.params
+    assert params["search[tags]"] == "network"
+    assert params["search[exclude-tags]"] == "ignore"
+    assert params["fields[workspaces]"] == "name,tag-names,execution-mode,current-run"
+    assert params["include"] == "current_run"
+
+    fetched = fetch_all(tfcloud, [], [])
+    assert sorted(ws.id for ws in fetched) == ["ws-1", "ws-3", "ws-4"]
+
+
+def test_trigger_all() -> None:
+    workspaces = [make_workspace(i) for i in range(250)]
+    workspaces[0].tags = ["ignore"]
+
+    fake = FakeTerraformCloud(workspaces)
+    requests = fake.requests
+    tfcloud = make_client(fake.transport)
+
+    report = asyncio.run(tfcloud.trigger_all("org", [], ["ignore"]))
+    assert report.succeeded
+    assert report.counts()["triggered"] == 249
+    # The API already filters out the excluded workspaces.
+    assert (report.listed, report.selected) == (249, 249)
+    assert (report.attempts, report.retried) == (249, 0)
+
+    runs = [r for r in requests if r.method == "POST"]
+    assert len(runs) == 249
+
+    # Runs are created while the pages are still being fetched.
+    first_run = requests.index(runs[0])
+    last_page = max(i for i, r in enumerate(requests) if r.method == "GET")
+    assert first_run < last_page
+
+
+def test_trigger_all_skip_active_runs() -> None:
+    workspaces = [
+        make_workspace(1),
+        make_workspace(2, run_status="applied"),
+        make_workspace(3, run_status="planning"),
+        make_workspace(4, run_status="policy_override"),
+    ]
+
+    fake = FakeTerraformCloud(workspaces)
+    tfcloud = make_client(fake.transport)
+
+    report = asyncio.run(tfcloud.trigger_all("org", [], []))
+    assert report.succeeded
+    assert report.counts()["skipped_active"] == 2
+
+    assert sorted(fake.triggered) == ["ws-1", "ws-2"]
+
+
+def test_trigger_all_checkpoint(tmp_path: Path) -> None:
+    workspaces = [make_workspace(i) for i in range(5)]
+    fake = FakeTerraformCloud(workspaces)
+    tfcloud = make_client(fake.transport)
+    store = LocalFileCheckpointStore(tmp_path)
+
+    async def trigger() -> None:
+        checkpoint = Checkpoint(store, "message", ["ws-1", "ws-3"])
+        report = await tfcloud.trigger_all("org", [], [], checkpoint=checkpoint)
+        assert report.counts()["checkpointed"] == 2
+
+    asyncio.run(trigger())
+
+    assert sorted(fake.triggered) == ["ws-0", "ws-2", "ws-4"]
+    assert asyncio.run(store.load("message")) == {"ws-0", "ws-2", "ws-4"}
+
+
+def test_trigger_all_priorities() -> None:
+    workspaces = [
+        make_workspace(1, ["low"]),
+        make_workspace(2),
+        make_workspace(3, ["high", "low"]),
+        make_workspace(4, ["medium"]),
+    ]
+    fake = FakeTerraformCloud(workspaces)
+    tfcloud = make_client(fake.transport)
+    priorities = {"high": 10, "medium": 5, "low": -1}
+
+    report = asyncio.run(
+        tfcloud.trigger_all("org", [], [], priorities=priorities, workers=1)
+    )
+    assert report.succeeded
+
+    assert fake.triggered == ["ws-3", "ws-4", "ws-2", "ws-1"]
+
+
+def test_trigger_all_priorities_last_page() -> None:
+    # The high priority workspaces are listed last, on another page.
+    workspaces = [make_workspace(i) for i in range(120)]
+    workspaces.append(make_workspace(120, ["high"]))
+    fake = FakeTerraformCloud(workspaces)
+    tfcloud = make_client(fake.transport)
+
+    report = asyncio.run(
+        tfcloud.trigger_all("org", [], [], priorities={"high": 10}, workers=1)
+    )
+    assert report.succeeded
+
+    assert fake.triggered[0] == "ws-120"
+
+
+def test_trigger_all_priorities_deadline() -> None:
+    workspaces = [make_workspace(i) for i in range(120)]
+    workspaces[10].tags = ["high"]
+    fake = FakeTerraformCloud(workspaces)
+    deadline = Deadline.after(60)
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.params.get("page[number]") == "2":
+            # The deadline gets close while the workspaces are listed.
+            deadline.at = time.monotonic() + PRIORITY_LISTING_MARGIN - 1
+        return await fake.handle(request)
+
+    tfcloud = make_client(httpx.MockTransport(handler))
+
+    with pytest.raises(DeadlineExceeded) as exc:
+        asyncio.run(
+            tfcloud.trigger_all(
+                "org", [], [], priorities={"high": 10}, deadline=deadline, workers=1
+            )
+        )
+
+    # The runs are created in the workspaces of the first page.
+    assert not exc.value.listed_all
+    assert fake.triggered[0] == "ws-10"
+    assert sorted(fake.triggered) == sorted(f"ws-{i}" for i in range(100))
+
+
+def test_trigger_all_deadline() -> None:
+    workspaces = [make_workspace(i) for i in range(5)]
+    fake = FakeTerraformCloud(workspaces)
+    requests = fake.requests
+    tfcloud = make_client(fake.transport)
+
+    # Not enough time to list the workspaces.
+    with pytest.raises(DeadlineExceeded) as exc:
+        asyncio.run(tfcloud.trigger_all("org", [], [], deadline=Deadline.after(0)))
+
+    assert exc.value.remaining == []
+    assert not exc.value.listed_all
+
+    # Enough time to list the workspaces, not to trigger them.
+    deadline = Deadline.after(DEADLINE_MARGIN)
+    with pytest.raises(DeadlineExceeded) as exc:
+        asyncio.run(tfcloud.trigger_all("org", [], [], deadline=deadline))
+
+    assert sorted(ws.id for ws in exc.value.remaining) == [f"ws-{i}" for i in range(5)]
+    assert exc.value.listed_all
+    assert exc.value.report.counts()["deferred"] == 5
+    assert not [r for r in requests if r.method == "POST"]
+
+
+def test_trigger_all_report_failures() -> None:
+    workspaces = [make_workspace(i) for i in range(4)]
+    fake = FakeTerraformCloud(workspaces)
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if request.method == "POST" and b'"ws-1"' in request.content:
+            return httpx.Response(422, json={"errors": ["Invalid"]})
+        return await fake.handle(request)
+
+    tfcloud = make_client(httpx.MockTransport(handler))
+    report = asyncio.run(tfcloud.trigger_all("org", [], []))
+
+    assert not report.succeeded
+    assert report.counts()["failed"] == 1
+    [failed] = report.failed
+    assert failed.workspace.id == "ws-1"
+    assert failed.error is not None and "422" in failed.error
+
+    attributes = report.attributes()
+    assert attributes["tfcloud.workspaces.triggered"] == 3
+    assert attributes["tfcloud.attempts"] == 4
+    assert attributes["tfcloud.latency.p50"] != 0
+
+
+def test_create_run_gateway_errors() -> None:
+    fake = FakeTerraformCloud([make_workspace(1)])
+    errors = [503, 502]
+    attempts = 0
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal attempts
+        attempts += 1
+        error = errors.pop(0) if errors else None
+        if error == 503:
+            return httpx.Response(503, json={"errors": []})
+
+        response = await fake.handle(request)
+        if error is not None:
+            # The request was handled, but the gateway returned an error.
+            return httpx.Response(error, json={"errors": []})
+        return response
+
+    tfcloud = make_client(httpx.MockTransport(handler))
+    tfcloud.retry_policy = RetryPolicy(base_delay=0)
+
+    with pytest.raises(httpx.HTTPStatusError, match="502"):
+        asyncio.run(tfcloud.create_run("org", "workspace-1", "ws-1"))
+
+    # Retried after the 503, but not after the 502: a single run was created.
+    assert attempts == 2
+    assert len(fake.runs) == 1
+
+    # The other requests are retried after a 502.
+    errors.append(502)
+    assert len(fetch_all(tfcloud, [], [])) == 1
+    assert attempts == 4
+
+
+def test_report_emit_caps_names() -> None:
+    report = TriggerReport("org")
+    for i in range(MAX_NAMES + 5):
+        ref = WorkspaceRef(id=f"ws-{i}", name=f"workspace-{i}")
+        report.add(WorkspaceResult(ref, WorkspaceStatus.FAILED, error="x" * 10_000))
+        report.add(WorkspaceResult(ref, WorkspaceStatus.DEFERRED))
+
+    with capture_logs() as logs:
+        report.emit(structlog.get_logger(), INVALID_SPAN)
+
+    [log] = logs
+    assert len(log["failed"]) == MAX_NAMES
+    assert all(len(error) == MAX_ERROR_LENGTH for error in log["failed"].values())
+    assert len(log["deferred"]) == MAX_NAMES
+    assert log["skipped_active"] == []
+    assert log["omitted"] == {"failed": 5, "deferred": 5}
+
+
+def test_report_bounded() -> None:
+    report = TriggerReport("org")
+    for i in range(SAMPLE_SIZE * 3):
+        ref = WorkspaceRef(id=f"ws-{i}", name=f"workspace-{i}")
+        status = WorkspaceStatus.SKIPPED_ACTIVE if i % 2 else WorkspaceStatus.TRIGGERED
+        report.add(WorkspaceResult(ref, status, attempts=1, latency=i / 1000))
+
+    assert report.counts()["triggered"] == report.counts()["skipped_active"]
+    assert report.attempts == SAMPLE_SIZE * 3 // 2
+    assert len(report.latency.values) == SAMPLE_SIZE
+    assert 1.2 < report.latency.percentile(50) < 1.8
+    assert len(report.skipped_active) == MAX_NAMES
+
+    # The slowest triggered workspaces are the last ones.
+    slowest = [result.workspace.id for result in report.slowest]
+    assert slowest[-1] == f"ws-{SAMPLE_SIZE * 3 - 2}"
+    assert len(report.slowest) == SLOWEST
+
+
+def test_trigger_all_throttled() -> None:
+    workspaces = [make_workspace(i) for i in range(60)]
+    fake = FakeTerraformCloud(
+        workspaces, throttle_every=10, throttle_burst=2, error_rate=0.05
+    )
+    tfcloud = make_client(fake.transport)
+    tfcloud.retry_policy = RetryPolicy(base_delay=0.001)
+
+    report = asyncio.run(tfcloud.trigger_all("org", [], []))
+    assert report.succeeded
+
+    # All the workspaces were triggered once, some after a few retries.
+    assert sorted(fake.triggered) == sorted(ws.id for ws in workspaces)
+    assert fake.status_codes[429] > 0 and fake.status_codes[503] > 0
+    assert report.attributes()["tfcloud.retried"] != 0
+
+
+def test_trigger_all_explicit_workspaces() -> None:
+    fake = FakeTerraformCloud([make_workspace(i) for i in range(3)])
+    tfcloud = make_client(fake.transport)
+    workspaces = [
+        WorkspaceRef(id="ws-1", name="one"),
+        WorkspaceRef(id="ws-2", name="two"),
+    ]
+
+    report = asyncio.run(tfcloud.trigger_all("org", [], [], workspaces=workspaces))
+    assert report.succeeded
+
+    # The workspaces are not listed.
+    assert all(r.method == "POST" for r in fake.requests)
+    assert sorted(fake.triggered) == ["ws-1", "ws-2"]
+
+
+def test_fetch_workspaces_inventory(tmp_path: Path) -> None:
+    workspaces = [make_workspace(i) for i in range(250)]
+    fake = FakeTerraformCloud(workspaces)
+    requests = fake.requests
+    tfcloud = make_client(fake.transport)
+    tfcloud.inventory = InventoryCache(tmp_path, max_age=60)
+
+    # Fetched, then served from the cache.
+    assert len(fetch_all(tfcloud, [], [])) == 250
+    assert len(fetch_all(tfcloud, [], [])) == 250
+    assert len(requests) == 3
+
+    # Loaded from the disk by another process, then revalidated.
+    tfcloud.inventory = InventoryCache(tmp_path, max_age=0)
+    requests.clear()
+    assert len(fetch_all(tfcloud, [], [])) == 250
+    assert len(requests) == 3
+    assert all(r.headers["if-none-match"].startswith("W/") for r in requests)
+
+    # A workspace changed: its page is fetched again.
+    workspaces[0].tags = ["changed"]
+    fetched = {ws.id: ws for ws in fetch_all(tfcloud, [], [])}
+    assert fetched["ws-0"].tag_names == ("changed",)
+
+    # An incomplete cache file is a cache miss.
+    for path in tmp_path.iterdir():
+        data = json.loads(path.read_text())
+        del data["etag"]
+        path.write_text(json.dumps(data))
+
+    tfcloud.inventory = InventoryCache(tmp_path, max_age=60)
+    requests.clear()
+    assert len(fetch_all(tfcloud, [], [])) == 250
+    assert len(requests) == 3
+    assert not any("if-none-match" in r.headers for r in requests)
+
+
+def test_iter_workspace_refs_inventory_revalidates() -> None:
+    fake = FakeTerraformCloud([make_workspace(i) for i in range(3)])
+    requests = fake.requests
+    tfcloud = make_client(fake.transport)
+    tfcloud.inventory = InventoryCache(max_age=60)
+
+    async def refs() -> list[str]:
+        return [ref.id async for ref in tfcloud.iter_workspace_refs("org", [], [])]
+
+    assert asyncio.run(refs()) == ["ws-0", "ws-1", "ws-2"]
+
+    # The cached page is revalidated: the new run is noticed.
+    asyncio.run(tfcloud.create_run("org", "workspace-1", "ws-1"))
+    requests.clear()
+    assert asyncio.run(refs()) == ["ws-0", "ws-2"]
+    assert "if-none-match" in requests[0].headers
+
+
+def test_workspace_page() -> None:
+    payload = {
+        "data": [
+            {
+                "id": "ws-1",
+                "type": "workspaces",
+                "attributes": {
+                    "name": "workspace-1",
+                    "tag-names": ["prod", "dns"],
+                    "execution-mode": "remote",
+                },
+                "relationships": {
+                    "current-run": {"data": {"id": "run-ws-1", "type": "runs"}}
+                },
+            },
+            {
+                "id": "ws-2",
+                "type": "workspaces",
+                "attributes": {
+                    "name": "workspace-2",
+                    "tag-names": ["prod"],
+                    "execution-mode": "remote",
+                },
+            },
+        ],
+        "included": [
+            {"id": "run-ws-1", "type": "runs", "attributes": {"status": "planning"}}
+        ],
+        "meta": {"pagination": {"total-pages": 3}},
+    }
+
+    page = WorkspacePage.parse(json.dumps(payload).encode())
+    assert page.total_pages == 3
+    assert page.workspaces == [
+        WorkspaceRecord(
+            "ws-1", "workspace-1", ("prod", "dns"), "remote", "run-ws-1", "planning"
+        ),
+        WorkspaceRecord("ws-2", "workspace-2", ("prod",), "remote"),
+    ]
+    assert page.workspaces[0].has_active_run
+    assert not page.workspaces[1].has_active_run
+
+    # The tags are only stored once.
+    assert page.workspaces[0].tag_names[0] is page.workspaces[1].tag_names[0]
+
+    assert WorkspacePage.load(json.loads(json.dumps(page.dump()))) == page
+
+
+def test_dry_run() -> None:
+    workspaces = [make_workspace(i, ["prod"] if i % 2 else []) for i in range(250)]
+    workspaces[1].run_status = "planning"
+    fake = FakeTerraformCloud(workspaces)
+    requests = fake.requests
+    tfcloud = make_client(fake.transport)
+
+    selected, stats = asyncio.run(tfcloud.dry_run("org", [], [], "tag:prod"))
+
+    assert len(selected) == 124
+    assert [ws.id for ws in stats.skipped_active] == ["ws-1"]
+    assert (stats.listed, stats.selected, stats.pages) == (250, 125, 3)
+    assert all(value >= 0 for value in stats.timings().values())
+
+    # No run is created.
+    assert all(r.method == "GET" for r in requests)
+
+    # The inventory cache is bypassed: the pages are fetched again.
+    tfcloud.inventory = InventoryCache(max_age=60)
+    asyncio.run(tfcloud.dry_run("org", [], [], "tag:prod"))
+    _, stats = asyncio.run(tfcloud.dry_run("org", [], [], "tag:prod"))
+    assert stats.pages == 3
+    assert stats.inventory == {}
+
+    # The workspaces of the request are not listed.
+    requests.clear()
+    refs = [WorkspaceRef(id="ws-1", name="workspace-1")]
+    selected, _ = asyncio.run(tfcloud.dry_run("org", [], [], workspaces=refs))
+    assert selected == refs
+    assert requests == []
@@ -0,0 +1,42 @@
+import asyncio
+
+import httpx
+
+from multani.ratelimit import AdaptiveLimiter
+from multani.tfcloud import TerraformCloud
+from multani.tfcloud.models import WorkspaceRef
+from multani.tfcloud.runs import RunTracker
+from tests.fake_tfcloud import FakeTerraformCloud
+from tests.fake_tfcloud import make_workspace
+
+
+def test_run_tracker() -> None:
+    workspaces = [make_workspace(i) for i in range(151)]
+    workspaces[-1].run_lifecycle = ("planning", "planning", "errored")
+    fake = FakeTerraformCloud(
+        workspaces, run_lifecycle=("planning", "planned_and_finished")
+    )
+
+    http = httpx.AsyncClient(transport=fake.transport)
+    limiter = AdaptiveLimiter(rate=10_000, initial_concurrency=32)
+    tfcloud = TerraformCloud(http, "token", limiter)
+
+    tracker = RunTracker(tfcloud, "org", min_interval=0.01, requests_per_minute=60_000)
+
+    async def trigger_and_wait() -> None:
+        for ws in workspaces:
+            run_id = await tfcloud.create_run("org", ws.name, ws.id)
+            tracker.add(WorkspaceRef(id=ws.id, name=ws.name), run_id)
+        await tracker.wait()
+
+    asyncio.run(trigger_and_wait())
+    summary = tracker.summary()
+
+    assert summary.counts() == {"planned_and_finished": 150, "errored": 1}
+    assert not summary.succeeded
+    assert all(outcome.duration is not None for outcome in summary.outcomes)
+
+    # The polls stop listing the runs once all the pending runs were seen: the
+    # last poll only waits for the most recent run, on the first page.
+    assert tracker.polls == 3
+    assert len([r for r in fake.requests if r.method == "GET"]) == 2 + 2 + 1